@@ -0,0 +1,142 @@
+"""
+Precomputed MeTTa advice for every (position, phase) pair on the board.
+The knowledge graph answers are fixed for a given pair, so only the
+portfolio summary and the token-balance check are rendered per request.
+"""
+
+from __future__ import annotations
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import threading
+
+from metta_store import MultipolyKnowledgeGraph
+
+
+class AdviceCell(NamedTuple):
+    strategy_text: str
+    position_analysis: str
+    purchase_profile: Optional[Tuple[str, str, str]]
+    airdrop: Optional[str]
+
+
+# Relations whose facts are keyed by a board position
+POSITION_RELATIONS = ("hasToken", "investmentValue", "riskLevel")
+
+# Advice for a position or phase that is not a string, which the graph
+# cannot know about
+UNKNOWN_CELL = AdviceCell("no specific strategy", "", None, None)
+
+
+class AdviceTable:
+    """Advice matrix over board positions and game phases, kept in step
+    with the knowledge graph through its change listener"""
+
+    def __init__(self, kb: MultipolyKnowledgeGraph) -> None:
+        self._kb = kb
+        self._cells: Dict[Tuple[str, str], AdviceCell] = {}
+        self._lock = threading.Lock()
+        kb.subscribe(self.invalidate)
+
+    def build(self) -> int:
+        """Fill every cell of the matrix, returning the number of cells"""
+        for position in ["start"] + self._kb.list_properties():
+            for phase in self._kb.list_phases():
+                self.cell(position, phase)
+        return len(self._cells)
+
+    def _is_known(self, position: str, phase: str) -> bool:
+        # Only board positions and phases from the graph are stored, so
+        # arbitrary client input cannot grow the table
+        if position != "start":
+            if not self._kb.query_property_token(position):
+                return False
+        return bool(self._kb.query_strategy(phase))
+
+    def _compute(self, position: str, phase: str) -> AdviceCell:
+        phase_strategy = self._kb.query_strategy(phase)
+        strategy_text = (
+            phase_strategy[0] if phase_strategy else "no specific strategy"
+        )
+        if position == "start":
+            airdrop_info = self._kb.query_game_mechanic("airdrop")
+            return AdviceCell(
+                strategy_text,
+                "",
+                None,
+                airdrop_info[0] if airdrop_info else None,
+            )
+        return AdviceCell(
+            strategy_text,
+            self._kb.get_best_move_advice(position),
+            self._kb.purchase_profile(position),
+            None,
+        )
+
+    def cell(self, position: str, phase: str) -> AdviceCell:
+        """Return the advice cell, computing and storing it on first use"""
+        if not isinstance(position, str) or not isinstance(phase, str):
+            # Client input; a list would not even hash as a key
+            return UNKNOWN_CELL
+        key = (position, phase)
+        with self._lock:
+            cached = self._cells.get(key)
+            if cached is not None:
+                return cached
+            cell = self._compute(position, phase)
+            if self._is_known(position, phase):
+                self._cells[key] = cell
+            return cell
+
+    def invalidate(
+        self, relation: Optional[str] = None, subject: Optional[str] = None
+    ) -> None:
+        """Drop the cells that depend on `(relation subject ...)` facts"""
+        with self._lock:
+            if relation is None:
+                self._cells.clear()
+                return
+
+            stale: List[Tuple[str, str]] = []
+            if relation in POSITION_RELATIONS:
+                stale = [k for k in self._cells if k[0] == subject]
+            elif relation == "yields":
+                positions = set(self._kb.query_token_properties(subject))
+                stale = [k for k in self._cells if k[0] in positions]
+            elif relation == "strategy":
+                stale = [k for k in self._cells if k[1] == subject]
+            elif relation == "airdropRule":
+                stale = [k for k in self._cells if k[0] == "start"]
+            for key in stale:
+                del self._cells[key]
+
+    def best_move(self, state: Dict[str, Any]) -> Optional[str]:
+        """Render tutor advice for a frontend game state"""
+        pos = state.get("position")
+        player_tokens = state.get("tokens", {})
+        game_phase = state.get("phase", "early_game")
+
+        if not pos or not isinstance(pos, str):
+            return None
+
+        cell = self.cell(pos, game_phase)
+        advice = self._kb.format_strategic_recommendations(
+            game_phase,
+            cell.strategy_text,
+            self._kb.describe_portfolio(state.get("owned_properties", [])),
+            cell.position_analysis,
+        )
+
+        # If player is on a property, analyze purchase opportunity
+        if pos != "start" and player_tokens:
+            purchase_analysis = self._kb.format_purchase_analysis(
+                pos, cell.purchase_profile, player_tokens
+            )
+            advice += f"\n\n🏠 Purchase Analysis:\n{purchase_analysis}"
+
+        # Add game mechanic reminders
+        if pos == "start" and cell.airdrop:
+            advice += f"\n\n💰 Airdrop: {cell.airdrop}"
+
+        return advice
+
+    def __len__(self) -> int:
+        return len(self._cells)
@@ -7,18 +7,36 @@ from uagents_core.contrib.protocols.chat import (
     chat_protocol_spec,
 )
 from datetime import datetime
-from uuid import uuid4
+from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+from uuid import uuid4
+import os
+from prompts import CHAT_PROTOCOL_SYSTEM_PROMPT, build_chat_messages
+from worker_pool import PoolBusyError, WorkerPool
+from chat_replies import ChatReplies
+from faq import FaqMatcher
+from cache import QuestionCache, TTLCache
+from conversations import ConversationStore
+from metta_store import MultipolyKnowledgeGraph
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Import ASI client for making API calls
 try:
-    from asi_client import chat_completion
+    from asi_client import (
+        async_chat_completion,
+        breaker as asi_breaker,
+        close_async_session,
+        probe_circuit,
+    )
 except ImportError:
     # Fallback if asi_client is not available
-    chat_completion = None
+    async_chat_completion = close_async_session = None
+    asi_breaker = probe_circuit = None
+
+# How often an open ASI:One circuit is probed for recovery
+ASI_PROBE_INTERVAL = float(os.getenv("ASI_ONE_PROBE_INTERVAL", "10"))
 
 
 class ChatRequest(Model):
@@ -31,9 +49,30 @@ class ChatResponse(Model):
     reply: str
 
 
+class ChatPrepareResponse(Model):
+    # FAQ or cached answer, already recorded as a turn
+    reply: Optional[str] = None
+    # Otherwise the ASI:One messages, with the user's history, and the
+    # turn_id to report the streamed answer under
+    messages: Optional[List[Dict[str, str]]] = None
+    turn_id: Optional[str] = None
+
+
+class ChatTurnRequest(Model):
+    turn_id: str
+    reply: str
+
+
+class ChatTurnResponse(Model):
+    recorded: bool
+
+
 class HealthResponse(Model):
     status: str
     agent: str
+    asi_circuit: Optional[Dict[str, Any]] = None  # ASI:One breaker state
+    workers: Optional[Dict[str, Any]] = None  # worker pool and queue depth
+    response_cache: Optional[Dict[str, Any]] = None  # hit/miss counters
 
 
 agent = Agent(
@@ -43,6 +82,50 @@ agent = Agent(
     publish_agent_details=True,
 )
 
+# Bounds the chats in progress; excess requests get BUSY_REPLY at once
+_workers = WorkerPool(
+    "chatbot-worker",
+    workers=int(os.getenv("CHATBOT_WORKERS", "8")),
+    queue_size=int(os.getenv("CHATBOT_QUEUE_SIZE", "64")),
+)
+BUSY_REPLY = (
+    "I'm answering a lot of players right now, please try again in a moment."
+)
+
+# Replies by msg_id, so mailbox redeliveries are not answered twice
+_chat_replies = ChatReplies(
+    maxsize=int(os.getenv("CHAT_REPLY_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("CHAT_REPLY_CACHE_TTL", "3600")),
+)
+
+# Rules questions are answered from the knowledge graph when the match is
+# confident enough, everything else goes to ASI:One
+_faq = FaqMatcher(
+    MultipolyKnowledgeGraph(),
+    min_confidence=float(os.getenv("FAQ_MIN_CONFIDENCE", "0.6")),
+    min_margin=float(os.getenv("FAQ_MIN_MARGIN", "0.15")),
+)
+
+# ASI:One answers by normalized question, partitioned by (model, prompt)
+_response_cache = QuestionCache(
+    maxsize=int(os.getenv("CHAT_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("CHAT_CACHE_TTL", "3600")),
+    # e.g. 0.9 to also reuse answers to near-identical questions
+    similarity=float(os.getenv("CHAT_CACHE_SIMILARITY", "0")),
+)
+PROTOCOL_PARTITION = ("asi1-fast", "chat-protocol")
+
+# Streamed turns handed out by /chat/prepare, by turn_id. The question,
+# model and cacheability stay here, so /chat/turn only supplies the reply
+_pending_turns = TTLCache(maxsize=1024, ttl=600)
+
+# Recent /chat turns per user_id, sent back to ASI:One as context
+_conversations = ConversationStore(
+    max_users=int(os.getenv("CHAT_MEMORY_USERS", "1000")),
+    token_budget=int(os.getenv("CHAT_MEMORY_TOKENS", "1000")),
+    idle_ttl=float(os.getenv("CHAT_MEMORY_IDLE_TTL", "1800")),
+)
+
 # Use the chat protocol specification directly - REQUIRED for ASI:One
 protocol = Protocol(spec=chat_protocol_spec)
 
@@ -64,50 +147,69 @@ async def handle_chat(ctx: Context, sender: str, msg: ChatMessage):
         if isinstance(item, TextContent):
             text += item.text
 
+    (reply_id, response), duplicate = await _chat_replies.reply(
+        sender, msg.msg_id, lambda: answer_chat(ctx, text)
+    )
+    if duplicate:
+        ctx.logger.info(f"Resending reply to redelivered {msg.msg_id}")
+
+    # Send response back to user
+    await ctx.send(
+        sender,
+        ChatMessage(
+            timestamp=datetime.utcnow(),
+            msg_id=reply_id,
+            content=[TextContent(type="text", text=response)],
+        ),
+    )
+
+
+async def answer_chat(ctx: Context, text: str) -> Tuple[str, bool]:
+    """Reply text for a chat message and whether it can be kept for a
+    redelivery (fallback replies are not)"""
+    local = _faq.answer(text)
+    if local is not None:
+        response, intent, confidence = local
+        ctx.logger.info(f"FAQ answer ({intent}, {confidence:.2f})")
+        return (
+            response
+            + "\n\n🎮 Try Multipoly: https://github.com/imApoorva36/multipoly",
+            True,
+        )
+
+    cached = _response_cache.get(PROTOCOL_PARTITION, text)
+    if cached is not None:
+        return cached, True
+
     # Generate intelligent response using ASI:One model
     response = (
         "I'm sorry, I'm having trouble processing your request right now."
     )
     try:
-        if chat_completion:
+        if async_chat_completion:
             # Use ASI:One model to generate response about Multipoly game
-            messages = [
-                {
-                    "role": "system",
-                    "content": """
-You are a helpful assistant for the Multipoly game. You help players understand the game mechanics, 
-provide general advice, and answer questions about the game. You are friendly and knowledgeable about 
-board games and strategy games similar to Monopoly. If users ask about other topics unrelated to 
-Multipoly or board games, politely redirect them back to the game. Try to append the link to try Multipoly 
-here: https://github.com/imApoorva36/multipoly in the response too"
-                """,
-                },
-                {"role": "user", "content": text},
-            ]
-
-            resp = chat_completion(messages)
+            messages = build_chat_messages(text, CHAT_PROTOCOL_SYSTEM_PROMPT)
+
+            async with _workers.slot():
+                resp = await async_chat_completion(messages)
             if resp and "choices" in resp and len(resp["choices"]) > 0:
                 response = resp["choices"][0]["message"]["content"]
                 # Add GitHub link to chatbot responses
                 if "github.com/imApoorva36/multipoly" not in response:
                     response += "\n\n🎮 Try Multipoly: https://github.com/imApoorva36/multipoly"
+                _response_cache.set(PROTOCOL_PARTITION, text, response)
         else:
             # Fallback response if ASI client is not available
             response = f"I'm a Multipoly game assistant. You asked: '{text}'. I'd be happy to help with game-related questions!\n\n🎮 Try Multipoly: https://github.com/imApoorva36/multipoly"
 
+    except PoolBusyError:
+        return BUSY_REPLY, False
     except Exception as e:
         ctx.logger.error(f"Error calling ASI:One API: {e}")
         response = "I'm having trouble connecting to my AI service right now, but I'm here to help with Multipoly!\n\n🎮 Try Multipoly: https://github.com/imApoorva36/multipoly"
+        return response, False
 
-    # Send response back to user
-    await ctx.send(
-        sender,
-        ChatMessage(
-            timestamp=datetime.utcnow(),
-            msg_id=uuid4(),
-            content=[TextContent(type="text", text=response)],
-        ),
-    )
+    return response, True
 
 
 @protocol.on_message(ChatAcknowledgement)
@@ -129,30 +231,90 @@ async def startup_handler(ctx: Context):
     ctx.logger.info("Registered chat protocol for ASI:One compatibility")
 
 
+@agent.on_interval(period=ASI_PROBE_INTERVAL)
+async def probe_asi(ctx: Context):
+    if not probe_circuit:
+        return
+    try:
+        if await probe_circuit():
+            ctx.logger.info("ASI:One probe succeeded, circuit closed")
+    except Exception as e:
+        ctx.logger.warning(f"ASI:One probe failed: {e}")
+
+
+@agent.on_interval(period=60.0)
+async def evict_idle_conversations(ctx: Context):
+    evicted = _conversations.evict_idle()
+    if evicted:
+        ctx.logger.info(f"Evicted {evicted} idle conversations")
+
+
+@agent.on_event("shutdown")
+async def shutdown_handler(ctx: Context):
+    if close_async_session:
+        await close_async_session()
+    _workers.shutdown()
+
+
+def prepare_chat(req: ChatRequest) -> Tuple[ChatPrepareResponse, bool]:
+    """Local answer to a /chat message, or the messages to ask ASI:One and
+    whether the answer may go into the shared cache"""
+    local = _faq.answer(req.message)
+    if local is not None:
+        _conversations.add(req.user_id, req.message, local[0])
+        return ChatPrepareResponse(reply=local[0]), False
+    history = _conversations.history(req.user_id)
+    # Answers that depend on earlier turns are neither served from nor
+    # added to the shared cache
+    cached = (
+        None
+        if history
+        else _response_cache.get((req.model, "rest"), req.message)
+    )
+    if cached is not None:
+        _conversations.add(req.user_id, req.message, cached)
+        return ChatPrepareResponse(reply=cached), False
+    messages = build_chat_messages(req.message, history=history)
+    return ChatPrepareResponse(messages=messages), not history
+
+
+def record_chat(
+    user_id: str, message: str, model: str, reply: str, cacheable: bool
+) -> None:
+    """Remember an ASI:One answer in the user's history and the cache"""
+    if cacheable:
+        _response_cache.set((model, "rest"), message, reply)
+    _conversations.add(user_id, message, reply)
+
+
 # REST endpoints for frontend
 @agent.on_rest_post("/chat", ChatRequest, ChatResponse)
 async def rest_chat(ctx: Context, req: ChatRequest) -> ChatResponse:
     # Generate intelligent response using ASI:One model
     reply = "I'm sorry, I'm having trouble processing your request."
+    prepared, cacheable = prepare_chat(req)
+    if prepared.reply is not None:
+        return ChatResponse(reply=prepared.reply)
     try:
-        if chat_completion:
-            messages = [
-                {
-                    "role": "system",
-                    "content": """
-You are a helpful assistant for the Multipoly game. Provide friendly,
-helpful responses about the game and general assistance.
-                """,
-                },
-                {"role": "user", "content": req.message},
-            ]
-
-            resp = chat_completion(messages)
+        if async_chat_completion:
+            async with _workers.slot():
+                resp = await async_chat_completion(
+                    prepared.messages, model=req.model
+                )
             if resp and "choices" in resp and len(resp["choices"]) > 0:
                 reply = resp["choices"][0]["message"]["content"]
+                record_chat(
+                    req.user_id,
+                    req.message,
+                    req.model,
+                    reply,
+                    cacheable,
+                )
         else:
             reply = f"Multipoly assistant: {req.message}"
 
+    except PoolBusyError:
+        reply = BUSY_REPLY
     except Exception as e:
         ctx.logger.error(f"Error in REST chat: {e}")
         reply = "I'm having trouble right now, please try again!"
@@ -160,10 +322,44 @@ helpful responses about the game and general assistance.
     return ChatResponse(reply=reply)
 
 
+# The gateway streams /chat replies itself: it asks /chat/prepare for a
+# local answer or the prompt, and reports the streamed answer to /chat/turn
+@agent.on_rest_post("/chat/prepare", ChatRequest, ChatPrepareResponse)
+async def rest_chat_prepare(
+    ctx: Context, req: ChatRequest
+) -> ChatPrepareResponse:
+    prepared, cacheable = prepare_chat(req)
+    if prepared.messages is not None:
+        prepared.turn_id = uuid4().hex
+        _pending_turns.set(
+            prepared.turn_id, (req.user_id, req.message, req.model, cacheable)
+        )
+    return prepared
+
+
+@agent.on_rest_post("/chat/turn", ChatTurnRequest, ChatTurnResponse)
+async def rest_chat_turn(
+    ctx: Context, req: ChatTurnRequest
+) -> ChatTurnResponse:
+    """Record a streamed answer; each turn_id is accepted once"""
+    turn = _pending_turns.pop(req.turn_id)
+    if turn is None:
+        return ChatTurnResponse(recorded=False)
+    user_id, message, model, cacheable = turn
+    record_chat(user_id, message, model, req.reply, cacheable)
+    return ChatTurnResponse(recorded=True)
+
+
 @agent.on_rest_get("/health", HealthResponse)
 async def health_check(ctx: Context) -> HealthResponse:
     """Health check endpoint"""
-    return HealthResponse(status="healthy", agent="multipoly-chatbot")
+    return HealthResponse(
+        status="healthy",
+        agent="multipoly-chatbot",
+        asi_circuit=asi_breaker.stats() if asi_breaker else None,
+        workers=_workers.stats(),
+        response_cache=_response_cache.stats(),
+    )
 
 
 if __name__ == "__main__":
@@ -1,13 +1,27 @@
 from __future__ import annotations
 from datetime import datetime
-from uuid import uuid4
-from typing import Any, Dict, Optional
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
 from uagents import Agent, Context, Model, Protocol
 from uagents.setup import fund_agent_if_low
 from dotenv import load_dotenv
 import os
-from metta_store import MultipolyKnowledgeGraph
-from asi_client import chat_completion
+from metta_store import MultipolyKnowledgeGraph, fingerprint_game_state
+from asi_client import (
+    async_chat_completion,
+    breaker as asi_breaker,
+    close_async_session,
+    probe_circuit,
+)
+from cache import TTLCache
+from knowledge_log import KnowledgeLog
+from advice_table import AdviceTable
+from prompts import PromptAccounting, build_move_messages
+from game_overlays import GameOverlay, GameOverlays
+from worker_pool import PoolBusyError, WorkerPool
+from chat_replies import ChatReplies
 from uagents_core.contrib.protocols.chat import (
     ChatAcknowledgement,
     ChatMessage,
@@ -25,16 +39,21 @@ class AdviseRequest(Model):
     state: Dict[str, Any]  # simplified Multipoly state
     question: Optional[str] = None
     force_refresh: Optional[bool] = False
+    game_id: Optional[str] = None  # reads this game's knowledge overlay
+    local_only: Optional[bool] = False  # skip ASI:One (gateway streams it)
+    deadline_ms: Optional[int] = None  # ASI:One budget, ADVISE_DEADLINE_MS
 
 
 class AdviseResponse(Model):
     advice: str
-    source: str  # "metta" | "asi" | "fallback"
+    source: str  # "metta" | "asi" | "cached" | "fallback" | "none" | "busy"
 
 
 class HealthResponse(Model):
     status: str
     agent: str
+    asi_circuit: Optional[Dict[str, Any]] = None  # ASI:One breaker state
+    workers: Optional[Dict[str, Any]] = None  # worker pool and queue depth
 
 
 class KnowledgeUpdateRequest(Model):
@@ -42,6 +61,7 @@ class KnowledgeUpdateRequest(Model):
     subject: str  # e.g., "Tokyo", "token_blue"
     value: str  # e.g., "excellent returns", "high"
     source: Optional[str] = "user_update"
+    game_id: Optional[str] = None  # write to this game's overlay only
 
 
 class KnowledgeUpdateResponse(Model):
@@ -52,6 +72,19 @@ class KnowledgeUpdateResponse(Model):
     value: str
 
 
+class KnowledgeBulkRequest(Model):
+    # One {"relation", "subject", "value"} object (or 3-item array) per line
+    ndjson: str
+    source: Optional[str] = "bulk_update"
+    game_id: Optional[str] = None
+
+
+class KnowledgeBulkResponse(Model):
+    success: bool
+    added: int
+    errors: list  # [{"line": int, "error": str}]
+
+
 class KnowledgeQueryResponse(Model):
     relation: str
     subject: str
@@ -59,6 +92,46 @@ class KnowledgeQueryResponse(Model):
     count: int
 
 
+class KnowledgeMatchRequest(Model):
+    # null, "*" or a "$variable" leaves a position unbound
+    relation: Optional[str] = None
+    subject: Optional[str] = None
+    value: Optional[str] = None
+    cursor: Optional[str] = None
+    limit: int = 100
+    game_id: Optional[str] = None
+
+
+class KnowledgeMatchResponse(Model):
+    results: list  # [{"relation", "subject", "value"}]
+    count: int
+    next_cursor: Optional[str] = None
+    error: Optional[str] = None
+
+
+class KnowledgeReloadRequest(Model):
+    path: str  # .metta file, relative to KB_PROGRAM_DIR
+
+
+class KnowledgeReloadResponse(Model):
+    success: bool
+    message: str
+    added: int = 0
+
+
+class PromptStatsResponse(Model):
+    stats: Dict[str, Any]
+
+
+class GameEndRequest(Model):
+    game_id: str
+
+
+class GameEndResponse(Model):
+    success: bool
+    game_id: str
+
+
 # --- Agent ---
 tutor_agent = Agent(
     name="multipoly-tutor",
@@ -67,71 +140,171 @@ tutor_agent = Agent(
     publish_agent_details=True,  # Publish agent details for discovery
 )
 fund_agent_if_low(tutor_agent.wallet.address())
-_store = MultipolyKnowledgeGraph()
 
-# Use the chat protocol specification directly - REQUIRED for ASI:One
-protocol = Protocol(spec=chat_protocol_spec)
-
-
-def metta_best_move(state: Dict[str, Any]) -> Optional[str]:
-    """Use MeTTa knowledge graph to provide comprehensive game advice"""
-    # Enhanced game state analysis using new MeTTa methods
-    pos = state.get("position")
-    player_tokens = state.get("tokens", {})
-    game_phase = state.get("phase", "early_game")
+# Knowledge graph snapshot, restored on startup and rewritten on a timer
+KB_SNAPSHOT_PATH = os.getenv("KB_SNAPSHOT_PATH", "tutor_kb_snapshot.json")
+KB_SNAPSHOT_INTERVAL = float(os.getenv("KB_SNAPSHOT_INTERVAL", "60"))
+# Directory /knowledge/reload may load .metta programs from
+KB_PROGRAM_DIR = os.path.realpath(os.getenv("KB_PROGRAM_DIR", "knowledge"))
+_store = MultipolyKnowledgeGraph(snapshot_path=KB_SNAPSHOT_PATH)
+# Dynamic facts since the last snapshot, group-committed to a log file
+_knowledge_log = KnowledgeLog(
+    os.getenv("KB_LOG_PATH", "tutor_kb.log"),
+    commit_interval=float(os.getenv("KB_LOG_COMMIT_INTERVAL", "0.02")),
+    max_bytes=int(os.getenv("KB_LOG_MAX_BYTES", str(1 << 20))),
+)
+_replayed_facts = _store.attach_log(_knowledge_log)
+# A fresh graph has never been saved, so write it on the first tick
+_saved_revision = _store.revision if _store.snapshot_restored else -1
+_advice_table = AdviceTable(_store)
+
+# Per-game facts live in overlays on top of the shared graph
+_games = GameOverlays(
+    _store,
+    idle_ttl=float(os.getenv("GAME_OVERLAY_IDLE_TTL", "1800")),
+    max_games=int(os.getenv("GAME_OVERLAY_MAX_GAMES", "1000")),
+)
 
-    if not pos:
-        return None
+# Advice cache keyed on the game state fingerprint plus the question
+_advice_cache = TTLCache(
+    maxsize=int(os.getenv("ADVICE_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("ADVICE_CACHE_TTL", "300")),
+)
+ASI_ERROR_PREFIX = "ASI:One error"
+_prompt_accounting = PromptAccounting()
+# Last good ASI:One answer per state, served when ASI:One misses the
+# deadline; not keyed on the revision so it survives knowledge updates
+_last_asi_advice = TTLCache(
+    maxsize=int(os.getenv("ADVICE_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("ADVICE_STALE_TTL", "3600")),
+)
+ADVISE_DEADLINE_MS = int(os.getenv("ADVISE_DEADLINE_MS", "3000"))
+# ASI:One calls left running past their deadline; the loop keeps only
+# weak references to tasks
+_background_calls: Set[asyncio.Task] = set()
+# How often an open ASI:One circuit is probed for recovery
+ASI_PROBE_INTERVAL = float(os.getenv("ASI_ONE_PROBE_INTERVAL", "10"))
+# Any change to the graph may change the advice for a cached state
+_store.subscribe(lambda relation, subject: _advice_cache.clear())
+
+# Knowledge graph work runs here so the agent loop stays free for acks
+# and health checks
+_workers = WorkerPool(
+    "tutor-worker",
+    workers=int(os.getenv("TUTOR_WORKERS", "4")),
+    queue_size=int(os.getenv("TUTOR_QUEUE_SIZE", "64")),
+)
+BUSY_ADVICE = "The tutor is busy right now, please ask again in a moment."
 
-    # Get comprehensive strategic recommendations
-    comprehensive_advice = _store.get_strategic_recommendations(
-        {
-            "position": pos,
-            "phase": game_phase,
-            "owned_properties": state.get("owned_properties", []),
-        }
-    )
+# Replies by msg_id, so mailbox redeliveries are not answered twice
+_chat_replies = ChatReplies(
+    maxsize=int(os.getenv("CHAT_REPLY_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("CHAT_REPLY_CACHE_TTL", "3600")),
+)
 
-    # If player is on a property, analyze purchase opportunity
-    if pos != "start" and player_tokens:
-        purchase_analysis = _store.analyze_purchase_opportunity(
-            pos, player_tokens
-        )
-        comprehensive_advice += (
-            f"\n\n🏠 Purchase Analysis:\n{purchase_analysis}"
-        )
+# Use the chat protocol specification directly - REQUIRED for ASI:One
+protocol = Protocol(spec=chat_protocol_spec)
 
-    # Add game mechanic reminders
-    if pos == "start":
-        airdrop_info = _store.query_game_mechanic("airdrop")
-        if airdrop_info:
-            comprehensive_advice += f"\n\n💰 Airdrop: {airdrop_info[0]}"
 
-    return (
-        comprehensive_advice
-        if "MeTTa not available" not in comprehensive_advice
-        else None
-    )
+def metta_best_move(
+    state: Dict[str, Any], overlay: Optional[GameOverlay] = None
+) -> Optional[str]:
+    """Use MeTTa knowledge graph to provide comprehensive game advice"""
+    # Served from the precomputed (position, phase) advice table
+    table = overlay.advice if overlay is not None else _advice_table
+    return table.best_move(state)
 
 
-def ask_asi_for_move(state: Dict[str, Any], question: Optional[str]) -> str:
-    prompt = (
-        "You are an AI game tutor for Multipoly - a strategic property investment game. "
-        "Based on the provided game state, give the next best move succinctly."
-    )
-    user = f"Game state: {state}. "
-    if question:
-        user += f"Player question: {question}"
-    messages = [
-        {"role": "system", "content": prompt},
-        {"role": "user", "content": user},
-    ]
+async def ask_asi_for_move(
+    state: Dict[str, Any], question: Optional[str]
+) -> str:
+    messages = build_move_messages(state, question)
+    started = time.monotonic()
     try:
-        resp = chat_completion(messages)
+        resp = await async_chat_completion(messages)
         response = resp["choices"][0]["message"]["content"]
+        _prompt_accounting.record(
+            state, question, time.monotonic() - started, resp.get("usage")
+        )
         return response
     except Exception as e:
-        return f"ASI:One error: {e}"
+        return f"{ASI_ERROR_PREFIX}: {e}"
+
+
+def local_fallback_advice(
+    state: Dict[str, Any], stale_key: Tuple, overlay: Optional[GameOverlay]
+) -> Tuple[str, str]:
+    """Best answer without ASI:One: an earlier ASI:One answer for the same
+    state, else the phase strategy template"""
+    cached = _last_asi_advice.get(stale_key)
+    if cached is not None:
+        return cached, "cached"
+    kb = overlay if overlay is not None else _store
+    return kb.get_strategic_recommendations(state), "fallback"
+
+
+async def _ask_and_cache(
+    state: Dict[str, Any],
+    question: Optional[str],
+    key: Tuple,
+    stale_key: Tuple,
+) -> str:
+    advice = await ask_asi_for_move(state, question)
+    # Errors are not cached so the next poll retries ASI:One
+    if not advice.startswith(ASI_ERROR_PREFIX):
+        _advice_cache.set(key, (advice, "asi"))
+        _last_asi_advice.set(stale_key, advice)
+    return advice
+
+
+async def get_advice(
+    state: Dict[str, Any],
+    question: Optional[str] = None,
+    force_refresh: bool = False,
+    game_id: Optional[str] = None,
+    local_only: bool = False,
+    deadline_ms: Optional[int] = None,
+) -> Tuple[str, str]:
+    """Return (advice, source), serving repeated states from the cache.
+    With `local_only` a state without MeTTa advice gives ("", "none")"""
+    overlay = _games.get(game_id)
+    # The revisions key out advice computed before a base or game update,
+    # including advice a computation still running writes back afterwards
+    stale_key = (game_id or "", fingerprint_game_state(state), question or "")
+    key = (
+        _store.revision,
+        overlay.revision if overlay is not None else 0,
+    ) + stale_key
+    if not force_refresh:
+        cached = _advice_cache.get(key)
+        if cached is not None:
+            return cached
+
+    advice = await _workers.run(metta_best_move, state, overlay)
+    if advice:
+        _advice_cache.set(key, (advice, "metta"))
+        return advice, "metta"
+    if local_only:
+        return "", "none"
+
+    if deadline_ms is None:
+        deadline_ms = ADVISE_DEADLINE_MS
+    # The ASI:One call keeps running past the deadline and fills the cache
+    # for the next poll
+    call = asyncio.ensure_future(
+        _ask_and_cache(state, question, key, stale_key)
+    )
+    _background_calls.add(call)
+    call.add_done_callback(_background_calls.discard)
+    try:
+        advice = await asyncio.wait_for(
+            asyncio.shield(call), max(deadline_ms, 0) / 1000
+        )
+    except asyncio.TimeoutError:
+        return local_fallback_advice(state, stale_key, overlay)
+    if advice.startswith(ASI_ERROR_PREFIX):
+        return local_fallback_advice(state, stale_key, overlay)
+    return advice, "asi"
 
 
 @protocol.on_message(ChatMessage)
@@ -148,6 +321,27 @@ async def handle_chat(ctx: Context, sender: str, msg: ChatMessage):
         if isinstance(item, TextContent):
             text += item.text
 
+    (reply_id, advice), duplicate = await _chat_replies.reply(
+        sender, msg.msg_id, lambda: answer_chat(text)
+    )
+    if duplicate:
+        ctx.logger.info(f"Resending advice for redelivered {msg.msg_id}")
+
+    await ctx.send(
+        sender,
+        ChatMessage(
+            timestamp=datetime.utcnow(),
+            msg_id=reply_id,
+            content=[
+                TextContent(type="text", text=advice),
+            ],
+        ),
+    )
+
+
+async def answer_chat(text: str) -> Tuple[str, bool]:
+    """Advice for a chat message and whether it can be kept for a
+    redelivery (busy and fallback answers are not)"""
     # Parse input for better context (expect JSON or simple city name)
     game_state = {"position": text}
     try:
@@ -162,20 +356,11 @@ async def handle_chat(ctx: Context, sender: str, msg: ChatMessage):
         game_state = {"position": text.strip()}
 
     # Try MeTTa KB first with enhanced context
-    advice = metta_best_move(game_state)
-    if not advice:
-        advice = ask_asi_for_move(game_state, None)
-
-    await ctx.send(
-        sender,
-        ChatMessage(
-            timestamp=datetime.utcnow(),
-            msg_id=uuid4(),
-            content=[
-                TextContent(type="text", text=advice),
-            ],
-        ),
-    )
+    try:
+        advice, source = await get_advice(game_state)
+    except PoolBusyError:
+        return BUSY_ADVICE, False
+    return advice, source in ("metta", "asi")
 
 
 @protocol.on_message(ChatAcknowledgement)
@@ -194,7 +379,61 @@ async def startup_handler(ctx: Context):
         "Tutor ready at %s (REST on http://127.0.0.1:8011)",
         tutor_agent.address,
     )
-    ctx.logger.info("MeTTa knowledge graph initialized for Multipoly")
+    ctx.logger.info(
+        f"Knowledge graph initialized for Multipoly ({_store.backend} backend, "
+        f"{'restored from snapshot' if _store.snapshot_restored else 'built'})"
+    )
+    if _replayed_facts:
+        ctx.logger.info(f"Replayed {_replayed_facts} facts from knowledge log")
+    ctx.logger.info(f"Advice table built with {_advice_table.build()} cells")
+
+
+def save_knowledge_snapshot() -> bool:
+    """Write the knowledge graph snapshot if it changed since the last save"""
+    global _saved_revision
+    if _store.revision == _saved_revision:
+        return False
+    _saved_revision = _store.save_snapshot()
+    return True
+
+
+@tutor_agent.on_interval(period=KB_SNAPSHOT_INTERVAL)
+async def snapshot_knowledge(ctx: Context):
+    try:
+        if await _workers.run(save_knowledge_snapshot):
+            ctx.logger.info(f"Knowledge snapshot saved to {KB_SNAPSHOT_PATH}")
+    except PoolBusyError:
+        # Retried on the next interval
+        pass
+    except OSError as e:
+        ctx.logger.error(f"Failed to save knowledge snapshot: {e}")
+
+
+@tutor_agent.on_event("shutdown")
+async def shutdown_handler(ctx: Context):
+    try:
+        save_knowledge_snapshot()
+    except OSError as e:
+        ctx.logger.error(f"Failed to save knowledge snapshot: {e}")
+    _knowledge_log.close()
+    _workers.shutdown()
+    await close_async_session()
+
+
+@tutor_agent.on_interval(period=ASI_PROBE_INTERVAL)
+async def probe_asi(ctx: Context):
+    try:
+        if await probe_circuit():
+            ctx.logger.info("ASI:One probe succeeded, circuit closed")
+    except Exception as e:
+        ctx.logger.warning(f"ASI:One probe failed: {e}")
+
+
+@tutor_agent.on_interval(period=60.0)
+async def evict_idle_games(ctx: Context):
+    evicted = _games.evict_idle()
+    if evicted:
+        ctx.logger.info(f"Evicted {evicted} idle game overlays")
 
 
 # REST endpoints for frontend already defined at the top of the file
@@ -203,20 +442,42 @@ async def startup_handler(ctx: Context):
 # REST endpoints for frontend
 @tutor_agent.on_rest_post("/advise", AdviseRequest, AdviseResponse)
 async def rest_advise(ctx: Context, req: AdviseRequest) -> AdviseResponse:
-    advice = metta_best_move(req.state)
-    source = "metta"
-
-    if not advice:
-        advice = ask_asi_for_move(req.state, req.question)
-        source = "asi"
-
+    try:
+        advice, source = await get_advice(
+            req.state,
+            req.question,
+            force_refresh=bool(req.force_refresh),
+            game_id=req.game_id,
+            local_only=bool(req.local_only),
+            deadline_ms=req.deadline_ms,
+        )
+    except PoolBusyError:
+        return AdviseResponse(advice=BUSY_ADVICE, source="busy")
     return AdviseResponse(advice=advice, source=source)
 
 
 @tutor_agent.on_rest_get("/health", HealthResponse)
 async def health_check(ctx: Context) -> HealthResponse:
     """Health check endpoint"""
-    return HealthResponse(status="healthy", agent="multipoly-tutor")
+    return HealthResponse(
+        status="healthy",
+        agent="multipoly-tutor",
+        asi_circuit=asi_breaker.stats(),
+        workers=_workers.stats(),
+    )
+
+
+@tutor_agent.on_rest_get("/stats/prompts", PromptStatsResponse)
+async def prompt_stats(ctx: Context) -> PromptStatsResponse:
+    """Token and latency accounting for ASI:One move prompts"""
+    return PromptStatsResponse(stats=_prompt_accounting.report())
+
+
+@tutor_agent.on_rest_post("/games/end", GameEndRequest, GameEndResponse)
+async def end_game(ctx: Context, req: GameEndRequest) -> GameEndResponse:
+    """Release the knowledge overlay of a finished game"""
+    ended = _games.end(req.game_id)
+    return GameEndResponse(success=ended, game_id=req.game_id)
 
 
 @tutor_agent.on_rest_post(
@@ -228,9 +489,12 @@ async def update_knowledge(
     """Update MeTTa knowledge graph with new facts"""
     try:
         # Use the knowledge graph's dynamic knowledge addition
-        result = _store.add_dynamic_knowledge(
-            req.relation, req.subject, req.value
+        kb = _games.get(req.game_id, create=True) or _store
+        result = await _workers.run(
+            kb.add_dynamic_knowledge, req.relation, req.subject, req.value
         )
+        # Group commit: wait for the batch fsync without blocking the loop
+        await _workers.run(_store.sync)
 
         ctx.logger.info(
             f"Knowledge updated: {req.relation}({req.subject}, {req.value}) - {result}"
@@ -254,6 +518,102 @@ async def update_knowledge(
         )
 
 
+def parse_knowledge_ndjson(
+    body: str,
+) -> Tuple[List[Tuple[str, str, str]], List[Dict[str, Any]]]:
+    """Split an NDJSON body into valid triples and per-line errors"""
+    triples: List[Tuple[str, str, str]] = []
+    errors: List[Dict[str, Any]] = []
+    for lineno, line in enumerate(body.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            if isinstance(item, dict):
+                triple = (item["relation"], item["subject"], item["value"])
+            elif isinstance(item, list) and len(item) == 3:
+                triple = tuple(item)
+            else:
+                raise ValueError(
+                    "expected an object or [relation, subject, value]"
+                )
+            if not all(isinstance(part, str) and part for part in triple):
+                raise ValueError(
+                    "relation, subject and value must be non-empty strings"
+                )
+        except KeyError as e:
+            errors.append({"line": lineno, "error": f"missing field {e}"})
+            continue
+        except ValueError as e:
+            errors.append({"line": lineno, "error": str(e)})
+            continue
+        triples.append(triple)
+    return triples, errors
+
+
+@tutor_agent.on_rest_post(
+    "/knowledge/bulk", KnowledgeBulkRequest, KnowledgeBulkResponse
+)
+async def bulk_update_knowledge(
+    ctx: Context, req: KnowledgeBulkRequest
+) -> KnowledgeBulkResponse:
+    """Add many facts in one batch from an NDJSON body"""
+    triples, errors = parse_knowledge_ndjson(req.ndjson)
+    try:
+        kb = _games.get(req.game_id, create=True) or _store
+        added = await _workers.run(kb.add_dynamic_knowledge_batch, triples)
+        await _workers.run(_store.sync)
+    except Exception as e:
+        ctx.logger.error(f"Failed bulk knowledge update: {e}")
+        return KnowledgeBulkResponse(
+            success=False,
+            added=0,
+            errors=errors + [{"line": None, "error": str(e)}],
+        )
+
+    ctx.logger.info(
+        f"Bulk knowledge update from {req.source}: {added} added, "
+        f"{len(errors)} rejected"
+    )
+    return KnowledgeBulkResponse(
+        success=not errors, added=added, errors=errors
+    )
+
+
+@tutor_agent.on_rest_post(
+    "/knowledge/reload", KnowledgeReloadRequest, KnowledgeReloadResponse
+)
+async def reload_knowledge(
+    ctx: Context, req: KnowledgeReloadRequest
+) -> KnowledgeReloadResponse:
+    """Load a .metta program into the graph; queries keep reading the
+    previous version until the new facts are published together"""
+    path = os.path.realpath(os.path.join(KB_PROGRAM_DIR, req.path))
+    if os.path.commonpath(
+        [path, KB_PROGRAM_DIR]
+    ) != KB_PROGRAM_DIR or not path.endswith(".metta"):
+        return KnowledgeReloadResponse(
+            success=False,
+            message=f"Only .metta files under {KB_PROGRAM_DIR} can be loaded",
+        )
+    try:
+        with open(path, encoding="utf-8") as f:
+            program = f.read()
+        added = await _workers.run(_store.load_program, program)
+        # Reloaded facts bypass the knowledge log, so persist them now
+        await _workers.run(save_knowledge_snapshot)
+    except Exception as e:
+        ctx.logger.error(f"Failed to reload knowledge from {path}: {e}")
+        return KnowledgeReloadResponse(
+            success=False, message=f"Failed to reload knowledge: {e}"
+        )
+
+    ctx.logger.info(f"Reloaded knowledge from {path}: {added} facts")
+    return KnowledgeReloadResponse(
+        success=True, message=f"Loaded {req.path}", added=added
+    )
+
+
 @tutor_agent.on_rest_get(
     "/knowledge/query/{relation}/{subject}", KnowledgeQueryResponse
 )
@@ -274,7 +634,9 @@ async def query_knowledge(
         elif relation == "strategy":
             results = _store.query_strategy(subject)
         else:
-            results = []
+            # Any other relation is looked up by its graph name
+            facts, _ = _store.match(relation, subject, limit=None)
+            results = [fact["value"] for fact in facts]
 
         return {
             "relation": relation,
@@ -291,6 +653,39 @@ async def query_knowledge(
         }
 
 
+MAX_MATCH_LIMIT = 1000
+
+
+def _pattern_term(term: Optional[str]) -> Optional[str]:
+    if term is None or term == "*" or term.startswith("$"):
+        return None
+    return term
+
+
+@tutor_agent.on_rest_post(
+    "/knowledge/match", KnowledgeMatchRequest, KnowledgeMatchResponse
+)
+async def match_knowledge(
+    ctx: Context, req: KnowledgeMatchRequest
+) -> KnowledgeMatchResponse:
+    """Page through the facts matching a (relation, subject, value) pattern"""
+    try:
+        kb = _games.get(req.game_id) or _store
+        results, next_cursor = kb.match(
+            _pattern_term(req.relation),
+            _pattern_term(req.subject),
+            _pattern_term(req.value),
+            cursor=req.cursor,
+            limit=max(1, min(req.limit, MAX_MATCH_LIMIT)),
+        )
+    except ValueError as e:
+        return KnowledgeMatchResponse(results=[], count=0, error=str(e))
+
+    return KnowledgeMatchResponse(
+        results=results, count=len(results), next_cursor=next_cursor
+    )
+
+
 # Ensure ASI:One API key is set
 ASI_ONE_API_KEY = os.getenv("ASI_ONE_API_KEY")
 if not ASI_ONE_API_KEY:
@@ -1,25 +1,66 @@
 """
 Minimal ASI:One Chat Completions client using OpenAI-compatible schema.
 Reads API key from environment ASI_ONE_API_KEY and optional BASE_URL.
+
+`chat_completion` is the blocking client and `async_chat_completion` the
+asyncio one for agent handlers. Both reuse keep-alive connections, apply
+connect/read timeouts and retry transient failures with jittered
+exponential backoff, honoring Retry-After. Identical concurrent requests
+are coalesced into one upstream call whose result they share, and a
+circuit breaker fails calls fast while ASI:One is erroring or slow. The `*_stream` variants
+request `stream: true` and yield content deltas as SSE chunks arrive.
 """
 
 from __future__ import annotations
+import asyncio
+import json
 import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import aiohttp
 import requests
-from typing import Any, Dict, List, Optional
+from requests.adapters import HTTPAdapter
+
+from circuit_breaker import CLOSED, CircuitBreaker
+from singleflight import AsyncSingleFlight, SingleFlight
 
 ASI_API_KEY_ENV = "ASI_ONE_API_KEY"
 ASI_BASE_URL = os.environ.get("ASI_ONE_BASE_URL", "https://api.asi1.ai/v1")
+CONNECT_TIMEOUT = float(os.environ.get("ASI_ONE_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("ASI_ONE_READ_TIMEOUT", "60"))
+MAX_RETRIES = int(os.environ.get("ASI_ONE_MAX_RETRIES", "2"))
+POOL_SIZE = int(os.environ.get("ASI_ONE_POOL_SIZE", "20"))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+# Responses that mean the request was not processed and can be resent
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
 
+_session: Optional[requests.Session] = None
+# aiohttp sessions are bound to an event loop, and each agent thread in
+# start.py runs its own loop
+_async_sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+_inflight = SingleFlight()
+breaker = CircuitBreaker(
+    "ASI:One",
+    window=int(os.environ.get("ASI_ONE_BREAKER_WINDOW", "20")),
+    error_rate=float(os.environ.get("ASI_ONE_BREAKER_ERROR_RATE", "0.5")),
+    slow_call=float(os.environ.get("ASI_ONE_BREAKER_SLOW_CALL", "10")),
+    reset_timeout=float(os.environ.get("ASI_ONE_BREAKER_RESET", "30")),
+)
+_async_inflight = AsyncSingleFlight()
 
-def chat_completion(
+
+def _build_request(
     messages: List[Dict[str, str]],
-    model: str = "asi1-fast",
-    temperature: float = 0.7,
-    tools: Optional[List[Dict[str, Any]]] = None,
-    tool_choice: Optional[str | Dict[str, Any]] = None,
-    parallel_tool_calls: Optional[bool] = None,
-) -> Dict[str, Any]:
+    model: str,
+    temperature: float,
+    tools: Optional[List[Dict[str, Any]]],
+    tool_choice: Optional[str | Dict[str, Any]],
+    parallel_tool_calls: Optional[bool],
+) -> tuple[Dict[str, str], Dict[str, Any]]:
     api_key = os.environ.get(ASI_API_KEY_ENV)
     if not api_key:
         raise RuntimeError(
@@ -41,8 +82,285 @@ def chat_completion(
         payload["tool_choice"] = tool_choice
     if parallel_tool_calls is not None:
         payload["parallel_tool_calls"] = parallel_tool_calls
-    resp = requests.post(
-        f"{ASI_BASE_URL}/chat/completions", json=payload, headers=headers
+    return headers, payload
+
+
+def _request_key(payload: Dict[str, Any]) -> str:
+    """Coalescing key: the payload with message text whitespace-normalized"""
+    messages = [
+        {**m, "content": " ".join(str(m.get("content", "")).split())}
+        for m in payload["messages"]
+    ]
+    return json.dumps({**payload, "messages": messages}, sort_keys=True)
+
+
+def _retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before retry `attempt` (0-based): the server's
+    Retry-After if given, else full-jitter exponential backoff"""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_CAP)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp()
+                return min(max(delay - time.time(), 0.0), BACKOFF_CAP)
+            except (TypeError, ValueError):
+                pass
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+
+
+def _parse_sse_line(line: str) -> Optional[str]:
+    """Content delta carried by one SSE line, "" for lines without text
+    and None at the end of the stream"""
+    if not line.startswith("data:"):
+        return ""
+    data = line[len("data:") :].strip()
+    if data == "[DONE]":
+        return None
+    try:
+        choices = json.loads(data).get("choices") or [{}]
+    except ValueError:
+        return ""
+    return (choices[0].get("delta") or {}).get("content") or ""
+
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        _session.mount("https://", adapter)
+        _session.mount("http://", adapter)
+    return _session
+
+
+def chat_completion(
+    messages: List[Dict[str, str]],
+    model: str = "asi1-fast",
+    temperature: float = 0.7,
+    tools: Optional[List[Dict[str, Any]]] = None,
+    tool_choice: Optional[str | Dict[str, Any]] = None,
+    parallel_tool_calls: Optional[bool] = None,
+) -> Dict[str, Any]:
+    headers, payload = _build_request(
+        messages, model, temperature, tools, tool_choice, parallel_tool_calls
+    )
+    return _inflight.do(
+        _request_key(payload), lambda: _post_completion(headers, payload)
+    )
+
+
+def _post_completion(
+    headers: Dict[str, str], payload: Dict[str, Any]
+) -> Dict[str, Any]:
+    for attempt in range(MAX_RETRIES + 1):
+        breaker.check()
+        started = time.monotonic()
+        ok = False
+        try:
+            resp = _get_session().post(
+                f"{ASI_BASE_URL}/chat/completions",
+                json=payload,
+                headers=headers,
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+            )
+            ok = resp.status_code not in RETRY_STATUSES
+            if ok or attempt == MAX_RETRIES:
+                resp.raise_for_status()
+                return resp.json()
+            retry_after = resp.headers.get("Retry-After")
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == MAX_RETRIES:
+                raise
+            retry_after = None
+        finally:
+            breaker.record(ok, time.monotonic() - started)
+        time.sleep(_retry_delay(attempt, retry_after))
+    raise AssertionError("unreachable")
+
+
+def chat_completion_stream(
+    messages: List[Dict[str, str]],
+    model: str = "asi1-fast",
+    temperature: float = 0.7,
+) -> Iterator[str]:
+    """Blocking streaming completion, yielding content deltas"""
+    headers, payload = _build_request(
+        messages, model, temperature, None, None, None
+    )
+    payload["stream"] = True
+    # Retries only happen before the first byte of the stream
+    for attempt in range(MAX_RETRIES + 1):
+        breaker.check()
+        started = time.monotonic()
+        ok = False
+        try:
+            resp = _get_session().post(
+                f"{ASI_BASE_URL}/chat/completions",
+                json=payload,
+                headers=headers,
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                stream=True,
+            )
+            ok = resp.status_code not in RETRY_STATUSES
+            if ok or attempt == MAX_RETRIES:
+                break
+            resp.close()
+            retry_after = resp.headers.get("Retry-After")
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == MAX_RETRIES:
+                raise
+            retry_after = None
+        finally:
+            # Time to the response headers; the body streams afterwards
+            breaker.record(ok, time.monotonic() - started)
+        time.sleep(_retry_delay(attempt, retry_after))
+
+    with resp:
+        resp.raise_for_status()
+        # SSE is UTF-8 by definition; requests would guess ISO-8859-1 for
+        # a text/event-stream without a charset
+        for line in resp.iter_lines():
+            delta = _parse_sse_line(line.decode("utf-8"))
+            if delta is None:
+                return
+            if delta:
+                yield delta
+
+
+def _get_async_session() -> aiohttp.ClientSession:
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=POOL_SIZE),
+            timeout=aiohttp.ClientTimeout(
+                connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT
+            ),
+        )
+        _async_sessions[loop] = session
+    return session
+
+
+async def async_chat_completion(
+    messages: List[Dict[str, str]],
+    model: str = "asi1-fast",
+    temperature: float = 0.7,
+    tools: Optional[List[Dict[str, Any]]] = None,
+    tool_choice: Optional[str | Dict[str, Any]] = None,
+    parallel_tool_calls: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """asyncio variant of chat_completion on a pooled aiohttp session"""
+    headers, payload = _build_request(
+        messages, model, temperature, tools, tool_choice, parallel_tool_calls
+    )
+    return await _async_inflight.do(
+        _request_key(payload),
+        lambda: _async_post_completion(headers, payload),
     )
-    resp.raise_for_status()
-    return resp.json()
+
+
+async def _async_post_completion(
+    headers: Dict[str, str], payload: Dict[str, Any]
+) -> Dict[str, Any]:
+    session = _get_async_session()
+    for attempt in range(MAX_RETRIES + 1):
+        breaker.check()
+        started = time.monotonic()
+        ok = False
+        try:
+            async with session.post(
+                f"{ASI_BASE_URL}/chat/completions",
+                json=payload,
+                headers=headers,
+            ) as resp:
+                ok = resp.status not in RETRY_STATUSES
+                if ok or attempt == MAX_RETRIES:
+                    resp.raise_for_status()
+                    return await resp.json()
+                retry_after = resp.headers.get("Retry-After")
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == MAX_RETRIES:
+                raise
+            retry_after = None
+        finally:
+            breaker.record(ok, time.monotonic() - started)
+        await asyncio.sleep(_retry_delay(attempt, retry_after))
+    raise AssertionError("unreachable")
+
+
+async def async_chat_completion_stream(
+    messages: List[Dict[str, str]],
+    model: str = "asi1-fast",
+    temperature: float = 0.7,
+) -> AsyncIterator[str]:
+    """asyncio streaming completion, yielding content deltas"""
+    headers, payload = _build_request(
+        messages, model, temperature, None, None, None
+    )
+    payload["stream"] = True
+    session = _get_async_session()
+    # Retries only happen before the first byte of the stream
+    for attempt in range(MAX_RETRIES + 1):
+        breaker.check()
+        started = time.monotonic()
+        ok = False
+        try:
+            resp = await session.post(
+                f"{ASI_BASE_URL}/chat/completions",
+                json=payload,
+                headers=headers,
+            )
+            ok = resp.status not in RETRY_STATUSES
+            if ok or attempt == MAX_RETRIES:
+                break
+            resp.release()
+            retry_after = resp.headers.get("Retry-After")
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == MAX_RETRIES:
+                raise
+            retry_after = None
+        finally:
+            # Time to the response headers; the body streams afterwards
+            breaker.record(ok, time.monotonic() - started)
+        await asyncio.sleep(_retry_delay(attempt, retry_after))
+
+    try:
+        resp.raise_for_status()
+        async for raw in resp.content:
+            delta = _parse_sse_line(raw.decode("utf-8").strip())
+            if delta is None:
+                return
+            if delta:
+                yield delta
+    finally:
+        resp.release()
+
+
+async def probe_circuit() -> bool:
+    """Health probe for an open breaker: once the cooldown has passed, a
+    cheap GET /models decides whether the breaker closes"""
+    if breaker.state == CLOSED:
+        return False
+    headers, _ = _build_request([], "", 0.0, None, None, None)
+    if not breaker.allow(probe_only=True):
+        return False
+    started = time.monotonic()
+    ok = False
+    try:
+        async with _get_async_session().get(
+            f"{ASI_BASE_URL}/models", headers=headers
+        ) as resp:
+            ok = resp.status < 500 and resp.status not in RETRY_STATUSES
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        pass
+    finally:
+        breaker.record(ok, time.monotonic() - started)
+    return ok
+
+
+async def close_async_session() -> None:
+    """Close the calling event loop's pooled session (agent shutdown)"""
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
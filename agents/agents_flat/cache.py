@@ -0,0 +1,134 @@
+"""
+Small in-process caches shared by the Multipoly agents.
+"""
+
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional
+import threading
+import time
+
+from textnorm import tokenize
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 300.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def keys(self) -> List[Hashable]:
+        """Unexpired keys, least recently used first"""
+        now = time.monotonic()
+        with self._lock:
+            return [k for k, (exp, _) in self._data.items() if exp > now]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def _trigrams(text: str) -> FrozenSet[str]:
+    padded = f"  {text} "
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+class QuestionCache:
+    """Answers keyed on normalized question text within a partition (e.g.
+    the model), so rephrasings of the same question share an entry.
+    With `similarity` > 0, a miss falls back to the most similar cached
+    question by character trigram Jaccard score."""
+
+    def __init__(
+        self, maxsize: int = 1024, ttl: float = 3600.0, similarity: float = 0
+    ) -> None:
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.similarity = similarity
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        return " ".join(tokenize(question))
+
+    def get(self, partition: Hashable, question: str) -> Optional[str]:
+        key = self.normalize(question)
+        entry = self._cache.get((partition, key)) if key else None
+        if entry is not None:
+            self.hits += 1
+            return entry[0]
+
+        if key and self.similarity > 0:
+            grams = _trigrams(key)
+            best, best_score = None, self.similarity
+            for cached_key in self._cache.keys():
+                if cached_key[0] != partition:
+                    continue
+                other = _trigrams(cached_key[1])
+                score = len(grams & other) / len(grams | other)
+                if score >= best_score:
+                    best, best_score = cached_key, score
+            if best is not None:
+                entry = self._cache.get(best)
+                if entry is not None:
+                    self.similar_hits += 1
+                    return entry[0]
+
+        self.misses += 1
+        return None
+
+    def set(self, partition: Hashable, question: str, answer: str) -> None:
+        key = self.normalize(question)
+        if key:
+            self._cache.set((partition, key), (answer,))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._cache),
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,50 @@
+"""
+Idempotent replies for the uAgents chat protocol. Mailbox delivery can hand
+an agent the same ChatMessage more than once; the reply is remembered by
+(sender, msg_id) so a redelivery is answered again without redoing the
+work.
+"""
+
+from __future__ import annotations
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from uuid import UUID, uuid4
+
+from cache import TTLCache
+from singleflight import AsyncSingleFlight
+
+# (reply msg_id, reply text)
+Reply = Tuple[UUID, str]
+
+
+class ChatReplies:
+    """Bounded, TTL-evicted msg_id -> reply store"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0) -> None:
+        self._replies = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Covers a redelivery that arrives while the first is in progress
+        self._inflight = AsyncSingleFlight()
+
+    async def reply(
+        self,
+        sender: str,
+        msg_id: UUID,
+        answer: Callable[[], Awaitable[Tuple[str, bool]]],
+    ) -> Tuple[Reply, bool]:
+        """Return (reply, duplicate). `answer()` gives the reply text and
+        whether it may be stored; failures are not, so they are retried"""
+        key = (sender, str(msg_id))
+        stored = self._replies.get(key)
+        if stored is not None:
+            return stored, True
+
+        async def run() -> Reply:
+            text, storable = await answer()
+            reply = (uuid4(), text)
+            if storable:
+                self._replies.set(key, reply)
+            return reply
+
+        return await self._inflight.do(key, run), False
+
+    def stats(self) -> Dict[str, Any]:
+        return self._replies.stats()
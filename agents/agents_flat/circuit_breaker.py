@@ -0,0 +1,123 @@
+"""
+Circuit breaker for calls to an upstream service. A rolling window of
+recent call outcomes trips the breaker open when too many calls fail or
+run slow. While open, calls are rejected immediately. After a cooldown,
+a single half-open probe decides whether the breaker closes again.
+"""
+
+from __future__ import annotations
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the upstream while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a rolling outcome window"""
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 5,
+        error_rate: float = 0.5,
+        slow_call: float = 10.0,
+        slow_rate: float = 0.8,
+        reset_timeout: float = 30.0,
+    ) -> None:
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        # (succeeded, seconds) for the most recent calls
+        self._outcomes: Deque[Tuple[bool, float]] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self, probe_only: bool = False) -> bool:
+        """Whether a call may go upstream now; after the cooldown the
+        first caller becomes the half-open probe. `rejected` counts the
+        calls turned away; a health probe passes `probe_only` as it only
+        runs while the breaker is open and is not a short-circuited call"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if (
+                self.state == OPEN
+                and time.monotonic() - self._opened_at >= self.reset_timeout
+            ):
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            if not probe_only:
+                self.rejected += 1
+            return False
+
+    def check(self) -> None:
+        if not self.allow():
+            raise CircuitOpenError(
+                f"{self.name} circuit is open, failing fast"
+            )
+
+    def record(self, succeeded: bool, seconds: float) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if succeeded and seconds < self.slow_call:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._trip()
+                return
+
+            self._outcomes.append((succeeded, seconds))
+            if self.state == CLOSED and self._tripped():
+                self._trip()
+
+    def _tripped(self) -> bool:
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return False
+        failed = sum(1 for ok, _ in self._outcomes if not ok)
+        slow = sum(1 for _, s in self._outcomes if s >= self.slow_call)
+        return (
+            failed / calls >= self.error_rate or slow / calls >= self.slow_rate
+        )
+
+    def _trip(self) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = len(self._outcomes)
+            failed = sum(1 for ok, _ in self._outcomes if not ok)
+            retry_in = 0.0
+            if self.state == OPEN:
+                retry_in = max(
+                    self._opened_at + self.reset_timeout - time.monotonic(),
+                    0.0,
+                )
+            return {
+                "state": self.state,
+                "window_calls": calls,
+                "window_errors": failed,
+                "rejected": self.rejected,
+                "retry_in": round(retry_in, 1),
+            }
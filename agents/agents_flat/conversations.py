@@ -0,0 +1,114 @@
+"""
+Per-user chat memory for the chatbot. Each conversation keeps its recent
+turns within a token budget; older turns are folded into a short summary
+line, so the prompt stays the same size however long a session runs.
+"""
+
+from __future__ import annotations
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List
+import threading
+import time
+
+from prompts import estimate_tokens
+
+# Longest excerpt of an old question kept in the summary
+SUMMARY_EXCERPT = 80
+
+
+class Conversation:
+    """Recent turns plus a summary of the ones that no longer fit"""
+
+    def __init__(self, token_budget: int) -> None:
+        self.token_budget = token_budget
+        self.turns: Deque[Dict[str, str]] = deque()
+        self.summary: Deque[str] = deque()
+        self.last_used = time.monotonic()
+
+    def _tokens(self) -> int:
+        return sum(estimate_tokens(t["content"]) for t in self.turns)
+
+    def add(self, question: str, answer: str) -> None:
+        # One turn may use at most half the budget
+        limit = self.token_budget * 2
+        self.turns.append({"role": "user", "content": question[:limit]})
+        self.turns.append({"role": "assistant", "content": answer[:limit]})
+        while len(self.turns) > 2 and self._tokens() > self.token_budget:
+            old_question = self.turns.popleft()["content"]
+            self.turns.popleft()
+            excerpt = " ".join(old_question.split())[:SUMMARY_EXCERPT]
+            self.summary.append(f"asked '{excerpt}'")
+        # The summary is held to a quarter of the budget
+        while self.summary and (
+            estimate_tokens("; ".join(self.summary)) > self.token_budget // 4
+        ):
+            self.summary.popleft()
+        self.last_used = time.monotonic()
+
+    def messages(self) -> List[Dict[str, str]]:
+        """History messages to place between the system prompt and the
+        new question"""
+        history: List[Dict[str, str]] = []
+        if self.summary:
+            history.append(
+                {
+                    "role": "system",
+                    "content": "Earlier in this conversation the player "
+                    + "; ".join(self.summary)
+                    + ".",
+                }
+            )
+        return history + list(self.turns)
+
+
+class ConversationStore:
+    """Conversations by user_id with an LRU cap and idle eviction"""
+
+    def __init__(
+        self,
+        max_users: int = 1000,
+        token_budget: int = 1000,
+        idle_ttl: float = 1800.0,
+    ) -> None:
+        self.max_users = max_users
+        self.token_budget = token_budget
+        self.idle_ttl = idle_ttl
+        self._conversations: OrderedDict[str, Conversation] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def history(self, user_id: str) -> List[Dict[str, str]]:
+        with self._lock:
+            conversation = self._conversations.get(user_id)
+            if conversation is None:
+                return []
+            self._conversations.move_to_end(user_id)
+            conversation.last_used = time.monotonic()
+            return conversation.messages()
+
+    def add(self, user_id: str, question: str, answer: str) -> None:
+        with self._lock:
+            conversation = self._conversations.get(user_id)
+            if conversation is None:
+                conversation = Conversation(self.token_budget)
+                self._conversations[user_id] = conversation
+                while len(self._conversations) > self.max_users:
+                    self._conversations.popitem(last=False)
+            self._conversations.move_to_end(user_id)
+            conversation.add(question, answer)
+
+    def evict_idle(self) -> int:
+        """Drop conversations unused for `idle_ttl` seconds"""
+        cutoff = time.monotonic() - self.idle_ttl
+        evicted = 0
+        with self._lock:
+            # Entries are kept in least recently used order
+            while self._conversations:
+                conversation = next(iter(self._conversations.values()))
+                if conversation.last_used > cutoff:
+                    break
+                self._conversations.popitem(last=False)
+                evicted += 1
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self._conversations)
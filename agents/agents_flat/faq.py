@@ -0,0 +1,168 @@
+"""
+Rules FAQ answered straight from the knowledge graph. Each intent has a
+keyword set and answer templates filled from query_game_mechanic; a
+question is matched by how much of its (IDF-weighted) wording an intent
+covers, and only confident matches are answered locally.
+"""
+
+from __future__ import annotations
+from math import log
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import threading
+
+from metta_store import MultipolyKnowledgeGraph
+from textnorm import tokenize
+
+
+class FaqIntent(NamedTuple):
+    name: str
+    keywords: str
+    # (mechanic, template) lines; "{}" receives the mechanic's value
+    answers: Sequence[Tuple[str, str]]
+
+
+FAQ_INTENTS = (
+    FaqIntent(
+        "dice",
+        "dice die roll rolling move movement spaces steps vrf random",
+        [("dice", "🎲 Dice: each turn you move by a {}.")],
+    ),
+    FaqIntent(
+        "airdrop",
+        "airdrop airdrops free reward bonus passing go start lap round",
+        [("airdrop", "💰 Airdrops: when passing start you {}.")],
+    ),
+    FaqIntent(
+        "staking",
+        "stake staking money rent income earn earning passive yield",
+        [
+            ("staking", "📈 Staking: on an owned property you {}."),
+            ("rent", "Each staked property {}."),
+        ],
+    ),
+    FaqIntent(
+        "purchase",
+        "buy buying purchase purchasing property properties land landed "
+        "afford cost price own owning token tokens",
+        [
+            ("purchase", "🏠 Buying: for an unowned property, you {} it."),
+            ("matching", "You pay with {}."),
+        ],
+    ),
+    FaqIntent(
+        "swapping",
+        "swap swapping exchange trade trading convert insufficient enough "
+        "missing token tokens",
+        [("swapping", "🔄 Swapping: with insufficient tokens you {}.")],
+    ),
+    FaqIntent(
+        "tokens",
+        "tokens token initial starting start begin beginning many colors "
+        "colours",
+        [("tokens", "🪙 Tokens: every player starts with an {}.")],
+    ),
+    FaqIntent(
+        "community",
+        "community chest dao vote voting governance proposal",
+        [("community", "🗳️ Community chest: it works as a {}.")],
+    ),
+    FaqIntent(
+        "tutor",
+        "tutor ai advice advise hint hints suggest suggestion metta",
+        [("tutor", "🤖 AI tutor: it {}.")],
+    ),
+)
+
+# Words that say nothing about which rule is asked about
+QUESTION_FILLERS = frozenset(
+    tokenize("work works rule rules explain mean happen use need know want")
+)
+
+
+def humanize(value: str) -> str:
+    return value.strip('"').replace("_", " ")
+
+
+class FaqMatcher:
+    """Keyword/IDF intent matcher over the graph's game mechanics"""
+
+    def __init__(
+        self,
+        kb: MultipolyKnowledgeGraph,
+        intents: Sequence[FaqIntent] = FAQ_INTENTS,
+        min_confidence: float = 0.6,
+        min_margin: float = 0.15,
+    ) -> None:
+        self._kb = kb
+        self._intents = intents
+        self.min_confidence = min_confidence
+        # Lead over the runner-up intent needed to answer locally
+        self.min_margin = min_margin
+        self._terms: List[frozenset] = [
+            frozenset(tokenize(intent.keywords)) for intent in intents
+        ]
+        df: Dict[str, int] = {}
+        for terms in self._terms:
+            for term in terms:
+                df[term] = df.get(term, 0) + 1
+        self._idf = {
+            term: log(1 + len(intents) / count) for term, count in df.items()
+        }
+        # A word no intent uses weighs as much as the rarest keyword, so
+        # off-topic wording pulls the confidence down
+        self._unknown_weight = max(self._idf.values(), default=1.0)
+        self._answers: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+        kb.subscribe(self.invalidate)
+
+    def invalidate(
+        self, relation: Optional[str] = None, subject: Optional[str] = None
+    ) -> None:
+        with self._lock:
+            self._answers.clear()
+
+    def _answer(self, intent: FaqIntent) -> Optional[str]:
+        with self._lock:
+            if intent.name in self._answers:
+                return self._answers[intent.name]
+        lines = []
+        for mechanic, template in intent.answers:
+            values = self._kb.query_game_mechanic(mechanic)
+            if values:
+                lines.append(template.format(humanize(values[0])))
+        answer = " ".join(lines) or None
+        with self._lock:
+            self._answers[intent.name] = answer
+        return answer
+
+    def classify(
+        self, question: str
+    ) -> Tuple[Optional[FaqIntent], float, float]:
+        """Best intent, its confidence (the share of the question's weight
+        that the intent's keywords cover) and the runner-up's confidence"""
+        words = set(tokenize(question)) - QUESTION_FILLERS
+        if not words:
+            return None, 0.0, 0.0
+        total = sum(self._idf.get(w, self._unknown_weight) for w in words)
+        best, best_score, runner_up = None, 0.0, 0.0
+        for intent, terms in zip(self._intents, self._terms):
+            score = sum(self._idf[w] for w in words & terms) / total
+            if score > best_score:
+                best, best_score, runner_up = intent, score, best_score
+            elif score > runner_up:
+                runner_up = score
+        return best, best_score, runner_up
+
+    def answer(self, question: str) -> Optional[Tuple[str, str, float]]:
+        """(answer, intent, confidence) for a confident rules question,
+        None when the question should go to the LLM"""
+        intent, confidence, runner_up = self.classify(question)
+        if intent is None or confidence < self.min_confidence:
+            return None
+        # Ambiguous between intents (a tie included)
+        if confidence - runner_up < self.min_margin:
+            return None
+        text = self._answer(intent)
+        if text is None:
+            return None
+        return text, intent.name, confidence
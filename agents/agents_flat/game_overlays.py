@@ -0,0 +1,173 @@
+"""
+Per-game knowledge overlays on top of the shared tutor knowledge graph.
+Reads fall through to the shared base graph and writes stay in the game's
+overlay, so a game's memory grows with its own dynamic facts only.
+"""
+
+from __future__ import annotations
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import threading
+import time
+
+from metta_store import Fact, MultipolyKnowledgeGraph, TripleIndex
+from advice_table import AdviceTable
+
+# Overlay fact ids are offset past any base id so match cursors stay
+# stable while the base graph keeps growing
+OVERLAY_ID_OFFSET = 1 << 40
+
+
+class OverlayIndex(TripleIndex):
+    """TripleIndex of overlay facts that also answers from the base graph's
+    currently published index. The game's own values come first, so a
+    per-game update wins for readers that take the first result"""
+
+    def __init__(self, base: MultipolyKnowledgeGraph) -> None:
+        super().__init__()
+        self._base_graph = base
+
+    @property
+    def _base(self) -> TripleIndex:
+        return self._base_graph.index
+
+    def objects(self, relation: str, subject: str) -> List[str]:
+        own = super().objects(relation, subject)
+        base = self._base.objects(relation, subject)
+        return own + [v for v in base if v not in own]
+
+    def subjects(self, relation: str, value: str) -> List[str]:
+        own = super().subjects(relation, value)
+        base = self._base.subjects(relation, value)
+        return own + [s for s in base if s not in own]
+
+    def pairs(self, relation: str) -> List[Tuple[str, str]]:
+        own = super().pairs(relation)
+        base = self._base.pairs(relation)
+        return own + [p for p in base if p not in own]
+
+    def match(
+        self,
+        relation: Optional[str] = None,
+        subject: Optional[str] = None,
+        value: Optional[str] = None,
+        after: int = -1,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[Tuple[int, Fact]], bool]:
+        matches: List[Tuple[int, Fact]] = []
+        if after < OVERLAY_ID_OFFSET:
+            matches, more = self._base.match(
+                relation, subject, value, after, limit
+            )
+            if more:
+                return matches, True
+            after = -1
+        else:
+            after -= OVERLAY_ID_OFFSET
+
+        remaining = None if limit is None else limit - len(matches)
+        own, more = super().match(relation, subject, value, after, remaining)
+        return (
+            matches + [(i + OVERLAY_ID_OFFSET, f) for i, f in own],
+            more,
+        )
+
+    def facts(self) -> List[Fact]:
+        return self._base.facts() + super().facts()
+
+    def overlay_facts(self) -> List[Fact]:
+        """Only the facts written to this overlay"""
+        return super().facts()
+
+    def __len__(self) -> int:
+        return len(self._base) + super().__len__()
+
+
+class GameOverlay(MultipolyKnowledgeGraph):
+    """Copy-on-write view of the shared graph for a single game"""
+
+    def __init__(self, base: MultipolyKnowledgeGraph, game_id: str) -> None:
+        self._setup(OverlayIndex(base))
+        self.backend = "overlay"
+        self.game_id = game_id
+        self.last_used = time.monotonic()
+        self._base = base
+        # Base changes show through the overlay, so pass them on
+        base.subscribe(self._notify)
+        self.advice = AdviceTable(self)
+
+    def _add_dynamic_fact(
+        self, relation: str, subject: str, value: str, grounded: bool
+    ) -> None:
+        # The OverlayIndex is the only home of a game's facts; nothing is
+        # kept in the fallback list that backs the shared graph
+        self._add_fact(relation, subject, value, grounded)
+
+    def close(self) -> None:
+        """Detach from the base graph once the game is evicted"""
+        self._base.unsubscribe(self._notify)
+
+
+class GameOverlays:
+    """Registry of per-game overlays with idle and capacity eviction"""
+
+    def __init__(
+        self,
+        base: MultipolyKnowledgeGraph,
+        idle_ttl: float = 1800.0,
+        max_games: int = 1000,
+    ) -> None:
+        self._base = base
+        self.idle_ttl = idle_ttl
+        self.max_games = max_games
+        self._games: OrderedDict[str, GameOverlay] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self, game_id: Optional[str], create: bool = False
+    ) -> Optional[GameOverlay]:
+        """Return the game's overlay, creating it for writes if needed"""
+        if not game_id:
+            return None
+        evicted: List[GameOverlay] = []
+        with self._lock:
+            overlay = self._games.get(game_id)
+            if overlay is None:
+                if not create:
+                    return None
+                overlay = GameOverlay(self._base, game_id)
+                self._games[game_id] = overlay
+                while len(self._games) > self.max_games:
+                    evicted.append(self._games.popitem(last=False)[1])
+            self._games.move_to_end(game_id)
+            overlay.last_used = time.monotonic()
+        for old in evicted:
+            old.close()
+        return overlay
+
+    def end(self, game_id: str) -> bool:
+        """Drop a finished game's overlay"""
+        with self._lock:
+            overlay = self._games.pop(game_id, None)
+        if overlay is None:
+            return False
+        overlay.close()
+        return True
+
+    def evict_idle(self) -> int:
+        """Drop overlays unused for `idle_ttl` seconds"""
+        cutoff = time.monotonic() - self.idle_ttl
+        evicted: List[GameOverlay] = []
+        with self._lock:
+            # Entries are kept in least recently used order
+            while self._games:
+                game_id, overlay = next(iter(self._games.items()))
+                if overlay.last_used > cutoff:
+                    break
+                evicted.append(self._games.pop(game_id))
+        for overlay in evicted:
+            overlay.close()
+        return len(evicted)
+
+    def __len__(self) -> int:
+        return len(self._games)
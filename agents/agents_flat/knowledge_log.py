@@ -0,0 +1,167 @@
+"""
+Append-only write-ahead log for dynamic knowledge graph facts.
+Records are NDJSON `[relation, subject, value, grounded]` lines after a
+`{"log_id": ...}` header. A background thread writes and fsyncs them in
+batches (group commit), so a burst of updates costs one fsync per commit
+interval. Compaction starts the log over under a new log_id; a snapshot
+names the log_id it covers, so a crash between writing the snapshot and
+resetting the log does not replay those records twice.
+"""
+
+from __future__ import annotations
+from typing import Iterator, List, Optional
+from uuid import uuid4
+import json
+import os
+import threading
+import time
+
+from metta_store import Fact
+
+
+class KnowledgeLog:
+    """Group-committed append-only log of (relation, subject, value) facts"""
+
+    def __init__(
+        self,
+        path: str,
+        commit_interval: float = 0.02,
+        max_bytes: int = 1 << 20,
+    ) -> None:
+        self.path = path
+        self.commit_interval = commit_interval
+        self.max_bytes = max_bytes
+        self._file = open(path, "ab")
+        self._drop_torn_tail()
+        self.size = self._file.seek(0, os.SEEK_END)
+        # None for a log written before headers existed
+        self.log_id: Optional[str] = None
+        if self.size == 0:
+            self._write_header()
+        else:
+            self.log_id = self._read_header()
+        self._pending: List[bytes] = []
+        self._next_lsn = 0
+        self._durable_lsn = 0
+        self._closed = False
+        # _io_lock serializes file writes with reset(); _cond guards the
+        # pending batch and sequence numbers
+        self._io_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name="knowledge-log", daemon=True
+        )
+        self._thread.start()
+
+    def _drop_torn_tail(self) -> None:
+        """Cut a record torn by a crash, so the next append starts on a
+        fresh line instead of being glued onto the fragment"""
+        with open(self.path, "rb") as f:
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            print(f"Knowledge log {self.path} torn record dropped at {end}")
+            self._file.truncate(end)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _write_header(self) -> None:
+        self.log_id = uuid4().hex
+        header = json.dumps({"log_id": self.log_id}) + "\n"
+        self._file.write(header.encode("utf-8"))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.size = len(header)
+
+    def _read_header(self) -> Optional[str]:
+        with open(self.path, "rb") as f:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:
+                return None
+        return header.get("log_id") if isinstance(header, dict) else None
+
+    def replay(self) -> Iterator[Fact]:
+        """Yield the logged facts, stopping at a torn trailing record"""
+        with open(self.path, "rb") as f:
+            for lineno, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                    if isinstance(record, dict):
+                        continue  # header
+                    relation, subject, value, grounded = record
+                except ValueError:
+                    print(f"Knowledge log {self.path} truncated at {lineno}")
+                    return
+                yield relation, subject, value, bool(grounded)
+
+    def append(self, fact: Fact) -> int:
+        """Queue a fact for the next group commit, returning its sequence
+        number for wait_durable()"""
+        record = json.dumps(list(fact), ensure_ascii=False) + "\n"
+        data = record.encode("utf-8")
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"Knowledge log {self.path} is closed")
+            self._pending.append(data)
+            self.size += len(data)
+            self._next_lsn += 1
+            self._cond.notify_all()
+            return self._next_lsn
+
+    def wait_durable(
+        self, lsn: Optional[int] = None, timeout: Optional[float] = None
+    ) -> bool:
+        """Block until record `lsn` (default: everything appended so far)
+        has been fsynced"""
+        with self._cond:
+            target = self._next_lsn if lsn is None else lsn
+            return self._cond.wait_for(
+                lambda: self._durable_lsn >= target, timeout
+            )
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if self._closed and not self._pending:
+                    return
+            # Give concurrent writers a moment to join this commit
+            time.sleep(self.commit_interval)
+            self._commit()
+
+    def _commit(self) -> None:
+        with self._io_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+                lsn = self._next_lsn
+            if batch:
+                self._file.write(b"".join(batch))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            with self._cond:
+                self._durable_lsn = max(self._durable_lsn, lsn)
+                self._cond.notify_all()
+
+    def reset(self) -> None:
+        """Drop every record once a snapshot covers them (compaction) and
+        start over under a new log_id"""
+        with self._io_lock:
+            with self._cond:
+                self._pending.clear()
+                self._file.truncate(0)
+                self._write_header()
+                self._durable_lsn = self._next_lsn
+                self._cond.notify_all()
+
+    def needs_compaction(self) -> bool:
+        return self.size >= self.max_bytes
+
+    def close(self) -> None:
+        """Commit outstanding records and stop the writer thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._commit()
+        self._file.close()
@@ -4,9 +4,27 @@ Based on SingularityNET MeTTa framework for structured knowledge representation
 """
 
 from __future__ import annotations
-from typing import Any, Dict, List, Optional
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 import hashlib
+import itertools
 import json
+import os
+import re
+import threading
+
+if TYPE_CHECKING:
+    from knowledge_log import KnowledgeLog
 
 
 def fingerprint_game_state(state: Dict[str, Any]) -> str:
@@ -16,31 +34,418 @@ def fingerprint_game_state(state: Dict[str, Any]) -> str:
 
 
 try:
-    from hyperon import MeTTa, E, S, ValueAtom
+    from hyperon import MeTTa, E, S, ValueAtom, AtomKind
 
     HYPERON_AVAILABLE = True
 except Exception:
     MeTTa = None  # type: ignore
-    E = S = ValueAtom = None  # type: ignore
+    E = S = ValueAtom = AtomKind = None  # type: ignore
     HYPERON_AVAILABLE = False
 
 
-class MultipolyKnowledgeGraph:
-    """MeTTa-based knowledge graph for Multipoly game rules and strategies"""
+# (relation, subject, value, grounded) - grounded facts hold a ValueAtom,
+# the others a plain symbol
+Fact = Tuple[str, str, str, bool]
+
+# Bump SNAPSHOT_FORMAT when the snapshot layout changes, and
+# BASE_KNOWLEDGE_VERSION when the built-in Delhi facts below change so old
+# snapshots rebuild their base and only keep their dynamic facts
+SNAPSHOT_FORMAT = 1
+BASE_KNOWLEDGE_VERSION = 1
+
+# Change callback: listener(relation, subject)
+Listener = Callable[[Optional[str], Optional[str]], None]
+
+
+def format_fact(fact: Fact, fmt: str = "ndjson") -> str:
+    """Render a fact as one NDJSON line or one MeTTa expression line"""
+    relation, subject, value, grounded = fact
+    if fmt == "metta":
+        # Grounded values are written as string literals so the output
+        # loads back through load_program / parse_metta_facts
+        rendered = json.dumps(value, ensure_ascii=False) if grounded else value
+        return f"({relation} {subject} {rendered})\n"
+    record = {
+        "relation": relation,
+        "subject": subject,
+        "value": value,
+        "grounded": grounded,
+    }
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def format_dump_error(message: str, fmt: str = "ndjson") -> str:
+    """Trailing line that marks a dump which stopped early"""
+    if fmt == "metta":
+        return "; error: " + " ".join(message.split()) + "\n"
+    return json.dumps({"error": message}, ensure_ascii=False) + "\n"
+
+
+# Strings are matched before comments, so a `;` inside a string literal
+# does not start one
+_METTA_TOKEN = re.compile(r'\(|\)|"(?:\\.|[^"\\])*"|;[^\n]*|[^\s();]+')
+
+
+def parse_metta_facts(program: str) -> List[Fact]:
+    """Extract the ground `(relation subject value)` facts of a MeTTa
+    program. Queries (`!`), rules and atoms with variables are skipped."""
+    stack: List[List[Any]] = [[]]
+    for token in _METTA_TOKEN.findall(program):
+        if token.startswith(";"):
+            continue
+        if token == "(":
+            stack.append([])
+        elif token == ")":
+            if len(stack) > 1:
+                expr = stack.pop()
+                stack[-1].append(expr)
+        else:
+            stack[-1].append(token)
+
+    facts: List[Fact] = []
+    skip_next = False
+    for item in stack[0]:
+        if item == "!":
+            skip_next = True
+            continue
+        if skip_next or not isinstance(item, list):
+            skip_next = False
+            continue
+        if len(item) != 3 or any(
+            isinstance(c, list) or c.startswith("$") for c in item
+        ):
+            continue
+        relation, subject, value = item
+        if value.startswith('"') and value.endswith('"') and len(value) > 1:
+            facts.append((relation, subject, json.loads(value), True))
+        else:
+            facts.append((relation, subject, value, False))
+    return facts
+
+
+# Index generations are unique across instances, so a match cursor from a
+# replaced index can never be mistaken for one of the new index
+_GENERATIONS = itertools.count()
+
+
+class TripleIndex:
+    """In-memory index over (relation subject value) facts of the graph.
+
+    Every index maps a key to the ascending ids (positions in `_facts`) of
+    the matching facts, so results keep insertion order and paginate by id.
+
+    Facts are append-only and readers only see ids below the published
+    watermark: a writer adds any number of facts and then makes them
+    visible together with publish(), a single atomic assignment, so
+    queries never lock and never see half of an update.
+    """
 
     def __init__(self) -> None:
+        self._facts: List[Fact] = []
+        self._by_subject: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        self._by_object: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        self._by_relation: Dict[str, List[int]] = defaultdict(list)
+        self._by_any_subject: Dict[str, List[int]] = defaultdict(list)
+        self._by_any_value: Dict[str, List[int]] = defaultdict(list)
+        self._published = 0
+        self.generation = next(_GENERATIONS)
+
+    def add(
+        self, relation: str, subject: str, value: str, grounded: bool = False
+    ) -> None:
+        """Index a single fact, visible to readers after publish()"""
+        fact_id = len(self._facts)
+        self._facts.append((relation, subject, value, grounded))
+        self._by_subject[(relation, subject)].append(fact_id)
+        self._by_object[(relation, value)].append(fact_id)
+        self._by_relation[relation].append(fact_id)
+        self._by_any_subject[subject].append(fact_id)
+        self._by_any_value[value].append(fact_id)
+
+    def publish(self) -> None:
+        """Make every added fact visible to readers at once"""
+        self._published = len(self._facts)
+
+    def _visible(self, ids: Sequence[int]) -> Sequence[int]:
+        return ids[: bisect_left(ids, self._published)]
+
+    def objects(self, relation: str, subject: str) -> List[str]:
+        """Values of `(relation subject $value)`"""
+        ids = self._visible(self._by_subject.get((relation, subject), ()))
+        return [self._facts[i][2] for i in ids]
+
+    def subjects(self, relation: str, value: str) -> List[str]:
+        """Subjects of `(relation $subject value)`"""
+        ids = self._visible(self._by_object.get((relation, value), ()))
+        return [self._facts[i][1] for i in ids]
+
+    def pairs(self, relation: str) -> List[Tuple[str, str]]:
+        """All (subject, value) pairs of `(relation $subject $value)`"""
+        ids = self._visible(self._by_relation.get(relation, ()))
+        return [self._facts[i][1:3] for i in ids]
+
+    def _candidates(
+        self,
+        relation: Optional[str],
+        subject: Optional[str],
+        value: Optional[str],
+    ) -> Sequence[int]:
+        # Pick the most selective index for the bound positions
+        if relation is not None and subject is not None:
+            ids = self._by_subject.get((relation, subject), ())
+        elif relation is not None and value is not None:
+            ids = self._by_object.get((relation, value), ())
+        elif subject is not None:
+            ids = self._by_any_subject.get(subject, ())
+        elif value is not None:
+            ids = self._by_any_value.get(value, ())
+        elif relation is not None:
+            ids = self._by_relation.get(relation, ())
+        else:
+            return range(self._published)
+        return self._visible(ids)
+
+    def match(
+        self,
+        relation: Optional[str] = None,
+        subject: Optional[str] = None,
+        value: Optional[str] = None,
+        after: int = -1,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[Tuple[int, Fact]], bool]:
+        """Facts matching a pattern where None is a wildcard, as (id, fact)
+        pairs with id > `after`; the flag tells whether more remain"""
+        ids = self._candidates(relation, subject, value)
+        matches: List[Tuple[int, Fact]] = []
+        for pos in range(bisect_right(ids, after), len(ids)):
+            fact = self._facts[ids[pos]]
+            if (
+                (relation is None or fact[0] == relation)
+                and (subject is None or fact[1] == subject)
+                and (value is None or fact[2] == value)
+            ):
+                if limit is not None and len(matches) == limit:
+                    return matches, True
+                matches.append((ids[pos], fact))
+        return matches, False
+
+    def facts(self) -> List[Fact]:
+        return self._facts[: self._published]
+
+    def __len__(self) -> int:
+        return self._published
+
+
+class MultipolyKnowledgeGraph:
+    """MeTTa-based knowledge graph for Multipoly game rules and strategies.
+
+    Queries are answered from the in-process TripleIndex. When hyperon is
+    not installed the index is the whole graph (the "python" backend), so
+    the tutor keeps giving local advice without a MeTTa space.
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None) -> None:
+        self._setup(TripleIndex(), snapshot_path)
         if HYPERON_AVAILABLE:
             self._metta = MeTTa()
+            self.backend = "metta"
+
+        self.snapshot_restored = bool(
+            snapshot_path and self._restore_snapshot(snapshot_path)
+        )
+        if not self.snapshot_restored:
             self._initialize_game_knowledge()
+            self._index.publish()
+            self._base_facts = Counter(self._index.facts())
+        self._index.publish()
+
+    @property
+    def index(self) -> TripleIndex:
+        """The currently published lookup index"""
+        return self._index
+
+    def _setup(
+        self, index: TripleIndex, snapshot_path: Optional[str] = None
+    ) -> None:
+        """Initialize the empty graph state around `index`"""
+        self._index = index
+        self._listeners: List[Listener] = []
+        # Dynamic facts added while running without a MeTTa space
+        self._fallback_facts: List[Tuple[str, str, str]] = []
+        # The facts that make up the base graph. Kept by value, not by
+        # position: a reindexed MeTTa space lists atoms in its own order
+        self._base_facts: Counter = Counter()
+        # Bumped on every change, used to skip unchanged snapshot writes
+        self.revision = 0
+        # Serializes writers with snapshot + log compaction
+        self._write_lock = threading.RLock()
+        self._log: Optional[KnowledgeLog] = None
+        # log_id of the knowledge log whose records the snapshot holds
+        self._snapshot_log_id: Optional[str] = None
+        self._snapshot_path = snapshot_path
+        self._metta = None
+        self.backend = "python"
+        self.snapshot_restored = False
+
+    def _add_fact(
+        self, relation: str, subject: str, value: str, grounded: bool = False
+    ) -> None:
+        """Add a fact to the MeTTa space (if any) and the lookup index"""
+        if self._metta is not None:
+            atom_value = ValueAtom(value) if grounded else S(value)
+            self._metta.space().add_atom(
+                E(S(relation), S(subject), atom_value)
+            )
+        self._index.add(relation, subject, value, grounded)
+
+    def subscribe(self, listener: Listener) -> None:
+        """Register a callback run as `listener(relation, subject)` after
+        the graph changes; `(None, None)` means anything may have changed"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Listener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(
+        self, relation: Optional[str] = None, subject: Optional[str] = None
+    ) -> None:
+        self.revision += 1
+        for listener in list(self._listeners):
+            listener(relation, subject)
+
+    def _restore_snapshot(self, path: str) -> bool:
+        """Load the graph from a snapshot, returning False if unusable"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable knowledge snapshot {path}: {e}")
+            return False
+        if data.get("format") != SNAPSHOT_FORMAT:
+            return False
+
+        if data.get("base_version") == BASE_KNOWLEDGE_VERSION:
+            for relation, subject, value, grounded in data["base"]:
+                self._add_fact(relation, subject, value, grounded)
         else:
-            self._metta = None
-            self._fallback_facts = []
+            self._initialize_game_knowledge()
+        self._index.publish()
+        self._base_facts = Counter(self._index.facts())
+
+        for relation, subject, value, grounded in data["dynamic"]:
+            self._add_dynamic_fact(relation, subject, value, grounded)
+        self._snapshot_log_id = data.get("log_id")
+        return True
+
+    def save_snapshot(self, path: Optional[str] = None) -> int:
+        """Atomically write the graph facts to `path` (default: the
+        snapshot the graph was restored from) and compact the attached
+        log, returning the revision that was saved"""
+        path = path or self._snapshot_path
+        if not path:
+            raise ValueError("No snapshot path configured")
+        with self._write_lock:
+            revision = self._write_snapshot(path)
+            if self._log is not None:
+                self._log.reset()
+        return revision
+
+    def _split_facts(self) -> Tuple[List[Fact], List[Fact]]:
+        """The indexed facts as (base, dynamic)"""
+        remaining = Counter(self._base_facts)
+        base: List[Fact] = []
+        dynamic: List[Fact] = []
+        for fact in self._index.facts():
+            if remaining[fact] > 0:
+                remaining[fact] -= 1
+                base.append(fact)
+            else:
+                dynamic.append(fact)
+        return base, dynamic
+
+    def _write_snapshot(self, path: str) -> int:
+        revision = self.revision
+        base, dynamic = self._split_facts()
+        data = {
+            "format": SNAPSHOT_FORMAT,
+            "base_version": BASE_KNOWLEDGE_VERSION,
+            "base": base,
+            "dynamic": dynamic,
+            "log_id": (
+                self._log.log_id
+                if self._log is not None
+                else self._snapshot_log_id
+            ),
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return revision
+
+    def attach_log(self, log: KnowledgeLog) -> int:
+        """Replay `log` on top of the graph and record every later dynamic
+        fact in it, returning the number of replayed facts"""
+        replayed = 0
+        with self._write_lock:
+            # The snapshot was written but the log not yet reset
+            covered = log.log_id is not None and (
+                log.log_id == self._snapshot_log_id
+            )
+            for relation, subject, value, grounded in (
+                () if covered else log.replay()
+            ):
+                self._add_dynamic_fact(relation, subject, value, grounded)
+                replayed += 1
+            if covered:
+                # Finish the interrupted compaction, so later records are
+                # not mistaken for covered ones
+                log.reset()
+            self._index.publish()
+            self._log = log
+        if replayed:
+            self._notify()
+        return replayed
+
+    def sync(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every logged dynamic fact is durable on disk"""
+        if self._log is None:
+            return True
+        return self._log.wait_durable(timeout=timeout)
+
+    def _reindex_space(self) -> None:
+        """Rebuild the lookup index from the atoms in the MeTTa space and
+        swap it in for readers in one assignment"""
+        index = TripleIndex()
+        for atom in self._metta.space().get_atoms():
+            if atom.get_metatype() != AtomKind.EXPR:
+                continue
+            children = atom.get_children()
+            if len(children) != 3:
+                continue
+            if any(
+                c.get_metatype() not in (AtomKind.SYMBOL, AtomKind.GROUNDED)
+                for c in children
+            ):
+                continue
+            relation, subject, value = children
+            grounded = value.get_metatype() == AtomKind.GROUNDED
+            index.add(
+                str(relation),
+                str(subject),
+                str(value.get_object().value) if grounded else str(value),
+                grounded,
+            )
+        index.publish()
+        self._index = index
 
     def _initialize_game_knowledge(self):
         """Initialize the MeTTa knowledge graph with Multipoly game rules"""
-        if not HYPERON_AVAILABLE:
-            return
-
         # ===== DELHI-THEMED PROPERTY GROUPS AND TOKEN RELATIONSHIPS =====
         # Group A (Historical Monuments & Heritage) - RED tokens
         group_a_places = [
@@ -52,12 +457,8 @@ class MultipolyKnowledgeGraph:
             "Akshardham_Temple",
         ]
         for place in group_a_places:
-            self._metta.space().add_atom(
-                E(S("hasToken"), S(place), S("token_red"))
-            )
-            self._metta.space().add_atom(
-                E(S("belongsToGroup"), S(place), S("Group_A_Heritage"))
-            )
+            self._add_fact("hasToken", place, "token_red")
+            self._add_fact("belongsToGroup", place, "Group_A_Heritage")
 
         # Group B (Modern Business & Tech Hubs) - BLUE tokens
         group_b_places = [
@@ -69,12 +470,8 @@ class MultipolyKnowledgeGraph:
             "Khan_Market",
         ]
         for place in group_b_places:
-            self._metta.space().add_atom(
-                E(S("hasToken"), S(place), S("token_blue"))
-            )
-            self._metta.space().add_atom(
-                E(S("belongsToGroup"), S(place), S("Group_B_Business"))
-            )
+            self._add_fact("hasToken", place, "token_blue")
+            self._add_fact("belongsToGroup", place, "Group_B_Business")
 
         # Group C (Educational & Cultural Centers) - GREEN tokens
         group_c_places = [
@@ -86,12 +483,8 @@ class MultipolyKnowledgeGraph:
             "Raj_Ghat",
         ]
         for place in group_c_places:
-            self._metta.space().add_atom(
-                E(S("hasToken"), S(place), S("token_green"))
-            )
-            self._metta.space().add_atom(
-                E(S("belongsToGroup"), S(place), S("Group_C_Education"))
-            )
+            self._add_fact("hasToken", place, "token_green")
+            self._add_fact("belongsToGroup", place, "Group_C_Education")
 
         # Group D (Markets & Entertainment) - YELLOW tokens
         group_d_places = [
@@ -103,162 +496,119 @@ class MultipolyKnowledgeGraph:
             "CP_Metro_Station",
         ]
         for place in group_d_places:
-            self._metta.space().add_atom(
-                E(S("hasToken"), S(place), S("token_yellow"))
-            )
-            self._metta.space().add_atom(
-                E(S("belongsToGroup"), S(place), S("Group_D_Markets"))
-            )
+            self._add_fact("hasToken", place, "token_yellow")
+            self._add_fact("belongsToGroup", place, "Group_D_Markets")
 
         # ===== TOKEN PROPERTIES =====
         # Each group has 6 properties, each color has 6 tokens (24 total)
-        self._metta.space().add_atom(
-            E(S("tokenCount"), S("token_red"), ValueAtom("6"))
-        )
-        self._metta.space().add_atom(
-            E(S("tokenCount"), S("token_blue"), ValueAtom("6"))
-        )
-        self._metta.space().add_atom(
-            E(S("tokenCount"), S("token_green"), ValueAtom("6"))
-        )
-        self._metta.space().add_atom(
-            E(S("tokenCount"), S("token_yellow"), ValueAtom("6"))
-        )
+        self._add_fact("tokenCount", "token_red", "6", grounded=True)
+        self._add_fact("tokenCount", "token_blue", "6", grounded=True)
+        self._add_fact("tokenCount", "token_green", "6", grounded=True)
+        self._add_fact("tokenCount", "token_yellow", "6", grounded=True)
 
         # Token yields based on regional economic strength
-        self._metta.space().add_atom(
-            E(S("yields"), S("token_red"), S("high"))
-        )  # Western markets
-        self._metta.space().add_atom(
-            E(S("yields"), S("token_blue"), S("high"))
-        )  # Asian growth
-        self._metta.space().add_atom(
-            E(S("yields"), S("token_green"), S("medium"))
-        )  # Emerging markets
-        self._metta.space().add_atom(
-            E(S("yields"), S("token_yellow"), S("medium"))
-        )  # Mixed regions
+        self._add_fact("yields", "token_red", "high")  # Western markets
+        self._add_fact("yields", "token_blue", "high")  # Asian growth
+        self._add_fact("yields", "token_green", "medium")  # Emerging markets
+        self._add_fact("yields", "token_yellow", "medium")  # Mixed regions
 
         # ===== GAME MECHANICS RULES =====
         # Starting position and movement
-        self._metta.space().add_atom(
-            E(S("startingPosition"), S("game"), S("start"))
-        )
-        self._metta.space().add_atom(
-            E(S("diceRange"), S("game"), ValueAtom("1-6_VRF_roll"))
-        )
+        self._add_fact("startingPosition", "game", "start")
+        self._add_fact("diceRange", "game", "1-6_VRF_roll", grounded=True)
 
         # Token distribution at game start
-        self._metta.space().add_atom(
-            E(
-                S("initialTokens"),
-                S("player"),
-                ValueAtom("equal_distribution_of_4_token_types"),
-            )
+        self._add_fact(
+            "initialTokens",
+            "player",
+            "equal_distribution_of_4_token_types",
+            grounded=True,
         )
 
         # Property purchase rules
-        self._metta.space().add_atom(
-            E(
-                S("purchaseRule"),
-                S("unowned_property"),
-                ValueAtom("can_buy_if_landed_on"),
-            )
+        self._add_fact(
+            "purchaseRule",
+            "unowned_property",
+            "can_buy_if_landed_on",
+            grounded=True,
         )
-        self._metta.space().add_atom(
-            E(
-                S("tokenMatching"),
-                S("purchase"),
-                ValueAtom("same_color_tokens_as_property_color"),
-            )
+        self._add_fact(
+            "tokenMatching",
+            "purchase",
+            "same_color_tokens_as_property_color",
+            grounded=True,
         )
-        self._metta.space().add_atom(
-            E(
-                S("tokenSwapping"),
-                S("insufficient_tokens"),
-                ValueAtom("can_swap_with_other_token_types"),
-            )
+        self._add_fact(
+            "tokenSwapping",
+            "insufficient_tokens",
+            "can_swap_with_other_token_types",
+            grounded=True,
         )
 
         # Staking and rent system
-        self._metta.space().add_atom(
-            E(
-                S("stakingRule"),
-                S("owned_property"),
-                ValueAtom("can_stake_money_for_rent_income"),
-            )
+        self._add_fact(
+            "stakingRule",
+            "owned_property",
+            "can_stake_money_for_rent_income",
+            grounded=True,
         )
-        self._metta.space().add_atom(
-            E(
-                S("rentSystem"),
-                S("property"),
-                ValueAtom("generates_income_at_certain_rate"),
-            )
+        self._add_fact(
+            "rentSystem",
+            "property",
+            "generates_income_at_certain_rate",
+            grounded=True,
         )
 
         # Special game elements
-        self._metta.space().add_atom(
-            E(
-                S("communityChest"),
-                S("mechanism"),
-                ValueAtom("DAO_voting_system"),
-            )
+        self._add_fact(
+            "communityChest",
+            "mechanism",
+            "DAO_voting_system",
+            grounded=True,
         )
-        self._metta.space().add_atom(
-            E(
-                S("airdropRule"),
-                S("passing_start"),
-                ValueAtom("receive_airdrop_every_round"),
-            )
+        self._add_fact(
+            "airdropRule",
+            "passing_start",
+            "receive_airdrop_every_round",
+            grounded=True,
         )
-        self._metta.space().add_atom(
-            E(S("fineSystem"), S("game"), ValueAtom("fines_exist_as_penalty"))
+        self._add_fact(
+            "fineSystem", "game", "fines_exist_as_penalty", grounded=True
         )
 
         # AI and chat system
-        self._metta.space().add_atom(
-            E(
-                S("aiTutor"),
-                S("feature"),
-                ValueAtom("analyzes_and_suggests_moves_via_MeTTa"),
-            )
+        self._add_fact(
+            "aiTutor",
+            "feature",
+            "analyzes_and_suggests_moves_via_MeTTa",
+            grounded=True,
         )
-        self._metta.space().add_atom(
-            E(
-                S("chatRoom"),
-                S("feature"),
-                ValueAtom("AI_agent_chatbot_available"),
-            )
+        self._add_fact(
+            "chatRoom",
+            "feature",
+            "AI_agent_chatbot_available",
+            grounded=True,
         )
 
         # ===== STRATEGIC INVESTMENT ADVICE =====
         # Game Phase Strategies (Delhi-themed)
-        self._metta.space().add_atom(
-            E(
-                S("strategy"),
-                S("early_game"),
-                ValueAtom(
-                    "Focus on Heritage sites and Business hubs for stable returns"
-                ),
-            )
+        self._add_fact(
+            "strategy",
+            "early_game",
+            "Focus on Heritage sites and Business hubs for stable returns",
+            grounded=True,
         )
-        self._metta.space().add_atom(
-            E(
-                S("strategy"),
-                S("mid_game"),
-                ValueAtom(
-                    "Balance portfolio across heritage, business, education, and markets"
-                ),
-            )
+        self._add_fact(
+            "strategy",
+            "mid_game",
+            "Balance portfolio across heritage, business, education, and markets",
+            grounded=True,
         )
-        self._metta.space().add_atom(
-            E(
-                S("strategy"),
-                S("late_game"),
-                ValueAtom(
-                    "Maximize rent from high-traffic locations like CP and India Gate"
-                ),
-            )
+        self._add_fact(
+            "strategy",
+            "late_game",
+            "Maximize rent from high-traffic locations like CP and India Gate",
+            grounded=True,
         )
 
         # Delhi location-specific investment advice based on real factors
@@ -273,12 +623,8 @@ class MultipolyKnowledgeGraph:
         }
 
         for place, advice in heritage_places.items():
-            self._metta.space().add_atom(
-                E(S("investmentValue"), S(place), ValueAtom(advice))
-            )
-            self._metta.space().add_atom(
-                E(S("riskLevel"), S(place), ValueAtom("low"))
-            )
+            self._add_fact("investmentValue", place, advice, grounded=True)
+            self._add_fact("riskLevel", place, "low", grounded=True)
 
         # Group B - Business & Tech hubs (High commercial value)
         business_places = {
@@ -291,12 +637,8 @@ class MultipolyKnowledgeGraph:
         }
 
         for place, advice in business_places.items():
-            self._metta.space().add_atom(
-                E(S("investmentValue"), S(place), ValueAtom(advice))
-            )
-            self._metta.space().add_atom(
-                E(S("riskLevel"), S(place), ValueAtom("medium"))
-            )
+            self._add_fact("investmentValue", place, advice, grounded=True)
+            self._add_fact("riskLevel", place, "medium", grounded=True)
 
         # Group C - Educational & Cultural centers (Medium yield, stable growth)
         education_places = {
@@ -309,12 +651,8 @@ class MultipolyKnowledgeGraph:
         }
 
         for place, advice in education_places.items():
-            self._metta.space().add_atom(
-                E(S("investmentValue"), S(place), ValueAtom(advice))
-            )
-            self._metta.space().add_atom(
-                E(S("riskLevel"), S(place), ValueAtom("low-medium"))
-            )
+            self._add_fact("investmentValue", place, advice, grounded=True)
+            self._add_fact("riskLevel", place, "low-medium", grounded=True)
 
         # Group D - Markets & Entertainment (Variable opportunities)
         market_places = {
@@ -327,196 +665,125 @@ class MultipolyKnowledgeGraph:
         }
 
         for place, advice in market_places.items():
-            self._metta.space().add_atom(
-                E(S("investmentValue"), S(place), ValueAtom(advice))
-            )
-            self._metta.space().add_atom(
-                E(S("riskLevel"), S(place), ValueAtom("medium"))
-            )
+            self._add_fact("investmentValue", place, advice, grounded=True)
+            self._add_fact("riskLevel", place, "medium", grounded=True)
 
         # Fine Types and Strategies
-        self._metta.space().add_atom(
-            E(S("fineType"), S("fine1"), S("one_time"))
-        )
-        self._metta.space().add_atom(
-            E(S("fineType"), S("fine2"), S("recurring"))
+        self._add_fact("fineType", "fine1", "one_time")
+        self._add_fact("fineType", "fine2", "recurring")
+        self._add_fact(
+            "avoidance",
+            "one_time",
+            "pay immediately to avoid penalties",
+            grounded=True,
         )
-        self._metta.space().add_atom(
-            E(
-                S("avoidance"),
-                S("one_time"),
-                ValueAtom("pay immediately to avoid penalties"),
-            )
-        )
-        self._metta.space().add_atom(
-            E(
-                S("avoidance"),
-                S("recurring"),
-                ValueAtom("negotiate or find alternative route"),
-            )
+        self._add_fact(
+            "avoidance",
+            "recurring",
+            "negotiate or find alternative route",
+            grounded=True,
         )
 
+    def match(
+        self,
+        relation: Optional[str] = None,
+        subject: Optional[str] = None,
+        value: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = 100,
+    ) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """Triple-pattern query where None positions are wildcards.
+        Returns one page of facts and the cursor of the next page, or None
+        once the results are exhausted."""
+        index = self._index
+        after = -1
+        if cursor:
+            try:
+                generation, last_id = map(int, cursor.split(":"))
+            except ValueError:
+                raise ValueError(f"Invalid cursor: {cursor}") from None
+            if generation != index.generation:
+                raise ValueError("Cursor is stale, restart the query")
+            after = last_id
+
+        page, more = index.match(relation, subject, value, after, limit)
+        next_cursor = f"{index.generation}:{page[-1][0]}" if more else None
+        return [
+            {"relation": r, "subject": s, "value": v, "grounded": g}
+            for _, (r, s, v, g) in page
+        ], next_cursor
+
     def query_property_token(self, property_name: str) -> List[str]:
         """Find what token a property has"""
-        if not HYPERON_AVAILABLE:
-            return []
-
-        property_name = property_name.strip('"')
-        query_str = f"!(match &self (hasToken {property_name} $token) $token)"
-        results = self._metta.run(query_str)
-        print(f"Token query results: {results} for query: {query_str}")
-
-        return (
-            [str(r[0]) for r in results if r and len(r) > 0] if results else []
-        )
+        return self._index.objects("hasToken", property_name.strip('"'))
 
     def query_token_yield(self, token: str) -> List[str]:
         """Find the yield level of a token"""
-        if not HYPERON_AVAILABLE:
-            return []
-
-        token = token.strip('"')
-        query_str = f"!(match &self (yields {token} $yield) $yield)"
-        results = self._metta.run(query_str)
-        print(f"Yield query results: {results} for query: {query_str}")
-
-        return (
-            [str(r[0]) for r in results if r and len(r) > 0] if results else []
-        )
+        return self._index.objects("yields", token.strip('"'))
 
     def query_investment_value(self, property_name: str) -> List[str]:
         """Get investment advice for a property"""
-        if not HYPERON_AVAILABLE:
-            return []
-
-        property_name = property_name.strip('"')
-        query_str = (
-            f"!(match &self (investmentValue {property_name} $value) $value)"
-        )
-        results = self._metta.run(query_str)
-        print(f"Investment value results: {results} for query: {query_str}")
-
-        return (
-            [r[0].get_object().value for r in results if r and len(r) > 0]
-            if results
-            else []
-        )
+        return self._index.objects("investmentValue", property_name.strip('"'))
 
     def query_strategy(self, game_phase: str) -> List[str]:
         """Get strategy advice for different game phases"""
-        if not HYPERON_AVAILABLE:
-            return []
-
-        game_phase = game_phase.strip('"')
-        query_str = (
-            f"!(match &self (strategy {game_phase} $strategy) $strategy)"
-        )
-        results = self._metta.run(query_str)
-        print(f"Strategy query results: {results} for query: {query_str}")
-
-        return (
-            [r[0].get_object().value for r in results if r and len(r) > 0]
-            if results
-            else []
-        )
+        return self._index.objects("strategy", game_phase.strip('"'))
 
     def query_risk_level(self, property_name: str) -> List[str]:
         """Get risk assessment for a property"""
-        if not HYPERON_AVAILABLE:
-            return []
-
-        property_name = property_name.strip('"')
-        query_str = f"!(match &self (riskLevel {property_name} $risk) $risk)"
-        results = self._metta.run(query_str)
-        print(f"Risk level results: {results} for query: {query_str}")
-
-        return (
-            [r[0].get_object().value for r in results if r and len(r) > 0]
-            if results
-            else []
-        )
+        return self._index.objects("riskLevel", property_name.strip('"'))
 
     def query_group_cities(self, group_name: str) -> List[str]:
         """Get all cities in a specific group"""
-        if not HYPERON_AVAILABLE:
-            return []
+        return self._index.subjects("belongsToGroup", group_name.strip('"'))
 
-        group_name = group_name.strip('"')
-        query_str = f"!(match &self (belongsToGroup $city {group_name}) $city)"
-        results = self._metta.run(query_str)
-        print(f"Group cities results: {results} for query: {query_str}")
+    def query_token_properties(self, token: str) -> List[str]:
+        """Get all properties bought with a specific token"""
+        return self._index.subjects("hasToken", token.strip('"'))
 
-        return (
-            [str(r[0]) for r in results if r and len(r) > 0] if results else []
-        )
+    def list_properties(self) -> List[str]:
+        """All properties that have a token assigned"""
+        return list(dict.fromkeys(s for s, _ in self._index.pairs("hasToken")))
+
+    def list_phases(self) -> List[str]:
+        """All game phases that have a strategy"""
+        return list(dict.fromkeys(s for s, _ in self._index.pairs("strategy")))
 
     def query_token_count(self, token_type: str) -> List[str]:
         """Get available token count for a token type"""
-        if not HYPERON_AVAILABLE:
-            return []
-
-        token_type = token_type.strip('"')
-        query_str = f"!(match &self (tokenCount {token_type} $count) $count)"
-        results = self._metta.run(query_str)
-        print(f"Token count results: {results} for query: {query_str}")
-
-        return (
-            [r[0].get_object().value for r in results if r and len(r) > 0]
-            if results
-            else []
-        )
+        return self._index.objects("tokenCount", token_type.strip('"'))
 
     def query_game_mechanic(self, mechanic: str) -> List[str]:
         """Query specific game mechanics and rules"""
-        if not HYPERON_AVAILABLE:
-            return []
-
-        # Define mechanic query mappings
-        mechanic_queries = {
-            "starting": "!(match &self (startingPosition $game $pos) $pos)",
-            "dice": "!(match &self (diceRange $game $range) $range)",
-            "tokens": "!(match &self (initialTokens $player $rule) $rule)",
-            "purchase": "!(match &self (purchaseRule $type $rule) $rule)",
-            "staking": "!(match &self (stakingRule $property $rule) $rule)",
-            "airdrop": "!(match &self (airdropRule $trigger $reward) $reward)",
-            "community": "!(match &self (communityChest $mech $desc) $desc)",
-            "tutor": "!(match &self (aiTutor $feat $desc) $desc)",
+        # Define mechanic -> relation mappings
+        mechanic_relations = {
+            "starting": "startingPosition",
+            "dice": "diceRange",
+            "tokens": "initialTokens",
+            "purchase": "purchaseRule",
+            "staking": "stakingRule",
+            "airdrop": "airdropRule",
+            "community": "communityChest",
+            "tutor": "aiTutor",
+            "matching": "tokenMatching",
+            "swapping": "tokenSwapping",
+            "rent": "rentSystem",
+            "fines": "fineSystem",
+            "chat": "chatRoom",
         }
 
-        query_str = mechanic_queries.get(mechanic.lower())
-        if not query_str:
+        relation = mechanic_relations.get(mechanic.lower())
+        if not relation:
             return []
 
-        results = self._metta.run(query_str)
-        print(f"Game mechanic '{mechanic}' results: {results}")
-
-        # Handle different result types
-        output = []
-        if results:
-            for r in results:
-                if r and len(r) > 0:
-                    if hasattr(r[0], "get_object"):
-                        output.append(r[0].get_object().value)
-                    else:
-                        output.append(str(r[0]))
-        return output
-
-    def analyze_purchase_opportunity(
-        self, city: str, player_tokens: Dict[str, int]
-    ) -> str:
-        """Analyze if a city purchase is viable given player's token portfolio"""
-        if not HYPERON_AVAILABLE:
-            return "MeTTa not available - basic analysis only"
+        return [value for _, value in self._index.pairs(relation)]
 
+    def purchase_profile(self, city: str) -> Optional[Tuple[str, str, str]]:
+        """Return (required token, investment advice, risk) for a city"""
         # Get city's required token
         required_tokens = self.query_property_token(city)
         if not required_tokens:
-            return f"Unknown city: {city}"
-
-        required_token = required_tokens[0]
-
-        # Check if player has required tokens
-        available_tokens = player_tokens.get(required_token, 0)
+            return None
 
         # Get investment advice
         investment_advice = self.query_investment_value(city)
@@ -526,6 +793,22 @@ class MultipolyKnowledgeGraph:
             investment_advice[0] if investment_advice else "no specific advice"
         )
         risk_text = risk_level[0] if risk_level else "unknown risk"
+        return required_tokens[0], advice_text, risk_text
+
+    @staticmethod
+    def format_purchase_analysis(
+        city: str,
+        profile: Optional[Tuple[str, str, str]],
+        player_tokens: Dict[str, int],
+    ) -> str:
+        """Render a purchase profile against the player's token balances"""
+        if profile is None:
+            return f"Unknown city: {city}"
+
+        required_token, advice_text, risk_text = profile
+
+        # Check if player has required tokens
+        available_tokens = player_tokens.get(required_token, 0)
 
         if available_tokens > 0:
             recommendation = f"✅ CAN PURCHASE: You have {available_tokens} {required_token} tokens"
@@ -540,27 +823,16 @@ class MultipolyKnowledgeGraph:
             f"Required Token: {required_token}"
         )
 
-    def get_strategic_recommendations(self, game_state: Dict[str, Any]) -> str:
-        """Get comprehensive strategic recommendations based on current game state"""
-        if not HYPERON_AVAILABLE:
-            return "MeTTa not available - basic recommendations"
-
-        current_phase = game_state.get("phase", "early_game")
-        player_position = game_state.get("position", "start")
-        owned_properties = game_state.get("owned_properties", [])
-
-        # Get phase strategy
-        phase_strategy = self.query_strategy(current_phase)
-        strategy_text = (
-            phase_strategy[0] if phase_strategy else "no specific strategy"
+    def analyze_purchase_opportunity(
+        self, city: str, player_tokens: Dict[str, int]
+    ) -> str:
+        """Analyze if a city purchase is viable given player's token portfolio"""
+        return self.format_purchase_analysis(
+            city, self.purchase_profile(city), player_tokens
         )
 
-        # Analyze current position if not at start
-        position_analysis = ""
-        if player_position != "start":
-            position_analysis = self.get_best_move_advice(player_position)
-
-        # Portfolio analysis
+    def describe_portfolio(self, owned_properties: List[str]) -> str:
+        """Summarize how many properties and groups a player owns"""
         portfolio_text = (
             f"Owned Properties: {len(owned_properties)} properties"
         )
@@ -582,19 +854,48 @@ class MultipolyKnowledgeGraph:
                         groups.add("Group_D")
 
             portfolio_text += f" across {len(groups)} different groups"
-
+        return portfolio_text
+
+    @staticmethod
+    def format_strategic_recommendations(
+        phase: str,
+        strategy_text: str,
+        portfolio_text: str,
+        position_analysis: str,
+    ) -> str:
         return (
             f"🎯 Strategic Analysis:\n\n"
-            f"Phase Strategy ({current_phase}): {strategy_text}\n\n"
+            f"Phase Strategy ({phase}): {strategy_text}\n\n"
             f"Portfolio: {portfolio_text}\n\n"
             f"Current Position Analysis:\n{position_analysis}"
         )
 
+    def get_strategic_recommendations(self, game_state: Dict[str, Any]) -> str:
+        """Get comprehensive strategic recommendations based on current game state"""
+        current_phase = game_state.get("phase", "early_game")
+        player_position = game_state.get("position", "start")
+        owned_properties = game_state.get("owned_properties", [])
+
+        # Get phase strategy
+        phase_strategy = self.query_strategy(current_phase)
+        strategy_text = (
+            phase_strategy[0] if phase_strategy else "no specific strategy"
+        )
+
+        # Analyze current position if not at start
+        position_analysis = ""
+        if player_position != "start":
+            position_analysis = self.get_best_move_advice(player_position)
+
+        return self.format_strategic_recommendations(
+            current_phase,
+            strategy_text,
+            self.describe_portfolio(owned_properties),
+            position_analysis,
+        )
+
     def get_best_move_advice(self, current_position: str) -> str:
         """Get comprehensive move advice based on current position"""
-        if not HYPERON_AVAILABLE:
-            return "MeTTa not available - using basic advice"
-
         # Get token for current position
         tokens = self.query_property_token(current_position)
         if not tokens:
@@ -629,24 +930,67 @@ class MultipolyKnowledgeGraph:
         self, relation: str, subject: str, obj_value: str
     ):
         """Add new knowledge to the graph dynamically"""
-        if not HYPERON_AVAILABLE:
-            self._fallback_facts.append((relation, subject, obj_value))
-            return f"Added to fallback: {relation}({subject}, {obj_value})"
-
-        if isinstance(obj_value, str) and not obj_value.startswith('"'):
-            # For string values, use ValueAtom
-            atom_value = ValueAtom(obj_value)
-        else:
-            # For symbolic values, use S
-            atom_value = S(obj_value)
+        self._write_dynamic([(relation, subject, obj_value)])
+        self._notify(relation, subject)
 
-        self._metta.space().add_atom(E(S(relation), S(subject), atom_value))
+        if self._metta is None:
+            return f"Added to fallback: {relation}({subject}, {obj_value})"
         return f"Added to MeTTa: {relation}({subject}, {obj_value})"
 
-    def load_program(self, program: str) -> None:
-        """Load MeTTa program from string"""
-        if HYPERON_AVAILABLE:
-            self._metta.run(program)
+    def add_dynamic_knowledge_batch(
+        self, triples: List[Tuple[str, str, str]]
+    ) -> int:
+        """Add many (relation, subject, value) facts with a single change
+        notification, returning the number of facts added"""
+        self._write_dynamic(triples)
+        if triples:
+            self._notify()
+        return len(triples)
+
+    def _write_dynamic(self, triples: List[Tuple[str, str, str]]) -> None:
+        with self._write_lock:
+            for relation, subject, obj_value in triples:
+                # String values become ValueAtoms, quoted values stay symbolic
+                grounded = isinstance(
+                    obj_value, str
+                ) and not obj_value.startswith('"')
+                self._add_dynamic_fact(relation, subject, obj_value, grounded)
+                if self._log is not None:
+                    self._log.append((relation, subject, obj_value, grounded))
+            # Readers see the whole batch or none of it
+            self._index.publish()
+            if (
+                self._log is not None
+                and self._log.needs_compaction()
+                and self._snapshot_path
+            ):
+                self.save_snapshot()
+
+    def _add_dynamic_fact(
+        self, relation: str, subject: str, value: str, grounded: bool
+    ) -> None:
+        self._add_fact(relation, subject, value, grounded)
+        if self._metta is None:
+            self._fallback_facts.append((relation, subject, value))
+
+    def load_program(self, program: str) -> int:
+        """Load MeTTa program from string, publishing its facts to readers
+        in one step. Returns the change in the number of indexed facts."""
+        with self._write_lock:
+            before = len(self._index)
+            if self._metta is not None:
+                self._metta.run(program)
+                self._reindex_space()
+            else:
+                # Without an interpreter only the plain facts can be loaded
+                for relation, subject, value, grounded in parse_metta_facts(
+                    program
+                ):
+                    self._add_fact(relation, subject, value, grounded)
+                self._index.publish()
+            added = len(self._index) - before
+        self._notify()
+        return added
 
 
 # For backward compatibility
@@ -663,20 +1007,28 @@ class MeTTaStore(MultipolyKnowledgeGraph):
         predicate: Optional[str],
         obj: Optional[str],
     ) -> List[Dict[str, str]]:
-        """Backward compatibility query method"""
-        if not HYPERON_AVAILABLE:
-            return []
-
-        # Convert to MeTTa query format
-        if predicate == "hasToken" and obj is None:
+        """Backward compatibility query method, None positions are wildcards"""
+        if predicate == "hasToken" and subject and obj is None:
             return [
-                {"$t": token}
-                for token in self.query_property_token(subject or "")
+                {"$t": token} for token in self.query_property_token(subject)
             ]
-        elif predicate == "yields" and obj is None:
+        elif predicate == "yields" and subject and obj is None:
             return [
                 {"$y": yield_val}
-                for yield_val in self.query_token_yield(subject or "")
+                for yield_val in self.query_token_yield(subject)
             ]
 
-        return []
+        # Bindings for the wildcard positions of the pattern
+        facts, _ = self.match(predicate, subject, obj, limit=None)
+        return [
+            {
+                var: fact[key]
+                for var, key, bound in (
+                    ("$s", "subject", subject),
+                    ("$p", "relation", predicate),
+                    ("$o", "value", obj),
+                )
+                if bound is None
+            }
+            for fact in facts
+        ]
@@ -0,0 +1,175 @@
+"""
+Prompts the Multipoly agents send to ASI:One. Kept free of agent setup so
+the gateway can build the same messages for its streaming endpoints.
+"""
+
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import threading
+
+# System prompt for chats arriving over the uAgents chat protocol
+CHAT_PROTOCOL_SYSTEM_PROMPT = """
+You are a helpful assistant for the Multipoly game. You help players understand the game mechanics, 
+provide general advice, and answer questions about the game. You are friendly and knowledgeable about 
+board games and strategy games similar to Monopoly. If users ask about other topics unrelated to 
+Multipoly or board games, politely redirect them back to the game. Try to append the link to try Multipoly 
+here: https://github.com/imApoorva36/multipoly in the response too"
+                """
+
+# System prompt for the REST /chat endpoint
+CHAT_REST_SYSTEM_PROMPT = """
+You are a helpful assistant for the Multipoly game. Provide friendly,
+helpful responses about the game and general assistance.
+                """
+
+TUTOR_SYSTEM_PROMPT = (
+    "You are an AI game tutor for Multipoly - a strategic property investment game. "
+    "Based on the provided game state, give the next best move succinctly. "
+    "State format: pos=<property> phase=<phase> cash=<n> "
+    "own=<owned properties> tok=[red,blue,green,yellow] token counts."
+)
+
+TOKEN_COLORS = ("red", "blue", "green", "yellow")
+# Budget for the tutor's user message, in estimated tokens
+MOVE_PROMPT_TOKEN_BUDGET = int(os.getenv("MOVE_PROMPT_TOKEN_BUDGET", "200"))
+
+
+def build_chat_messages(
+    text: str,
+    system_prompt: str = CHAT_REST_SYSTEM_PROMPT,
+    history: Optional[List[Dict[str, str]]] = None,
+) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": system_prompt},
+        *(history or []),
+        {"role": "user", "content": text},
+    ]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English)"""
+    return (len(text) + 3) // 4
+
+
+def encode_state(state: Dict[str, Any]) -> Tuple[str, List[str]]:
+    """Compact encoding of the fields the tutor uses, as (head, owned)"""
+    fields = []
+    position = state.get("position")
+    if position:
+        fields.append(f"pos={position}")
+    phase = state.get("phase") or state.get("game_phase")
+    if phase:
+        fields.append(f"phase={phase}")
+    if state.get("cash") is not None:
+        fields.append(f"cash={state['cash']}")
+    tokens = state.get("tokens")
+    if isinstance(tokens, dict) and tokens:
+        counts = [
+            tokens.get(color, tokens.get(f"token_{color}", 0))
+            for color in TOKEN_COLORS
+        ]
+        fields.append("tok=[" + ",".join(str(c) for c in counts) + "]")
+    owned = state.get("owned_properties") or state.get("properties") or []
+    return " ".join(fields), [str(p) for p in owned]
+
+
+def compact_move_prompt(
+    state: Dict[str, Any],
+    question: Optional[str],
+    budget: int = MOVE_PROMPT_TOKEN_BUDGET,
+) -> Tuple[str, bool]:
+    """User message for the tutor within `budget` estimated tokens,
+    returned with whether anything had to be truncated"""
+    head, owned = encode_state(state)
+    question = " ".join((question or "").split())
+    truncated = False
+
+    def render(owned_shown: List[str], q: str) -> str:
+        text = head
+        if owned:
+            text += " own=" + ",".join(owned_shown)
+            if len(owned_shown) < len(owned):
+                text += f"+{len(owned) - len(owned_shown)}more"
+        if q:
+            text += f"\nQ: {q}"
+        return text
+
+    # The question gets at most half the budget, then owned properties
+    # are dropped from the end until the message fits
+    if estimate_tokens(question) > budget // 2:
+        question = question[: budget * 2 - 1] + "…"
+        truncated = True
+    shown = list(owned)
+    while shown and estimate_tokens(render(shown, question)) > budget:
+        shown.pop()
+        truncated = True
+    text = render(shown, question)
+    if estimate_tokens(text) > budget:
+        text = text[: budget * 4 - 1] + "…"
+        truncated = True
+    return text, truncated
+
+
+def build_move_messages(
+    state: Dict[str, Any], question: Optional[str]
+) -> List[Dict[str, str]]:
+    user, _ = compact_move_prompt(state, question)
+    return [
+        {"role": "system", "content": TUTOR_SYSTEM_PROMPT},
+        {"role": "user", "content": user},
+    ]
+
+
+class PromptAccounting:
+    """Running totals comparing compact tutor prompts to the raw
+    `str(state)` encoding they replace, with ASI:One latency"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.raw_tokens = 0
+        self.compact_tokens = 0
+        self.truncated = 0
+        self.upstream_prompt_tokens = 0
+        self.upstream_completion_tokens = 0
+        self.latency = 0.0
+
+    def record(
+        self,
+        state: Dict[str, Any],
+        question: Optional[str],
+        seconds: float,
+        usage: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        raw = f"Game state: {state}. "
+        if question:
+            raw += f"Player question: {question}"
+        compact, truncated = compact_move_prompt(state, question)
+        usage = usage or {}
+        with self._lock:
+            self.calls += 1
+            self.raw_tokens += estimate_tokens(raw)
+            self.compact_tokens += estimate_tokens(compact)
+            self.truncated += truncated
+            self.upstream_prompt_tokens += usage.get("prompt_tokens", 0)
+            self.upstream_completion_tokens += usage.get(
+                "completion_tokens", 0
+            )
+            self.latency += seconds
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self.calls or 1
+            return {
+                "calls": self.calls,
+                "raw_state_tokens_est": self.raw_tokens,
+                "compact_state_tokens_est": self.compact_tokens,
+                "saved_tokens_est": self.raw_tokens - self.compact_tokens,
+                "truncated": self.truncated,
+                "upstream_prompt_tokens": self.upstream_prompt_tokens,
+                "upstream_completion_tokens": (
+                    self.upstream_completion_tokens
+                ),
+                "avg_latency_ms": round(self.latency / calls * 1000, 1),
+            }
@@ -0,0 +1,74 @@
+"""
+Request coalescing: concurrent calls with the same key share one execution
+and its result (or exception). Nothing is kept once the call finishes, so
+this is not a cache; later calls run again.
+"""
+
+from __future__ import annotations
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Thread-based coalescing for blocking calls"""
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """asyncio coalescing; calls are grouped per event loop"""
+
+    def __init__(self) -> None:
+        self._tasks: Dict[Tuple[int, Hashable], asyncio.Task] = {}
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        slot = (id(asyncio.get_running_loop()), key)
+        task = self._tasks.get(slot)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[slot] = task
+            task.add_done_callback(lambda _: self._tasks.pop(slot, None))
+        else:
+            self.shared += 1
+        # A cancelled waiter must not cancel the call the others share
+        return await asyncio.shield(task)
@@ -0,0 +1,45 @@
+"""
+Text normalization for matching player questions: lowercasing, punctuation
+and stopword removal, and a light suffix-stripping stemmer. Good enough to
+map "How do airdrops work?" and "airdrop working" onto the same terms
+without an NLP dependency.
+"""
+
+from __future__ import annotations
+from typing import List
+import re
+
+STOPWORDS = frozenset("""
+    a about am an and any are as at be been but by can could do does did
+    for from get got had has have how i if in into is it its me my of on
+    or our please should so some tell than that the their them then there
+    these they this to us was we what when where which who why will with
+    would you your game multipoly
+    """.split())
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def stem(word: str) -> str:
+    """Strip common English suffixes (airdrops, swapping, staked ...)"""
+    if len(word) <= 3:
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    for suffix in ("ing", "ed"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[: -len(suffix)]
+            # swapp -> swap, but keep roll and pass
+            if word[-1] == word[-2] and word[-1] not in "aeioulsz":
+                word = word[:-1]
+            return word.rstrip("e")
+    if word.endswith("es") and word[-3] in "sxz":
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    return word.rstrip("e") if len(word) > 3 else word
+
+
+def tokenize(text: str) -> List[str]:
+    """Stemmed content words of `text`, in order"""
+    return [stem(w) for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
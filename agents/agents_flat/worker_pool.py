@@ -0,0 +1,72 @@
+"""
+Bounded worker pool that keeps blocking work off an agent's event loop.
+At most `workers` jobs run at once and `queue_size` more may wait; past
+that, callers get PoolBusyError right away instead of queueing without
+bound behind the loop.
+"""
+
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+import asyncio
+
+
+class PoolBusyError(RuntimeError):
+    """Raised when the pool's workers and queue are all taken"""
+
+
+class WorkerPool:
+    """Thread pool plus admission control for one agent's event loop"""
+
+    def __init__(self, name: str, workers: int = 4, queue_size: int = 64):
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix=name
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.pending = 0
+        self.rejected = 0
+
+    def _admit(self) -> None:
+        # Only called from the agent's loop thread, so no lock is needed
+        if self.pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise PoolBusyError(f"{self.name} is busy, try again shortly")
+        self.pending += 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run blocking `fn(*args)` on a worker thread"""
+        self._admit()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Admission for async work (e.g. network calls) that should count
+        against the same concurrency limit without needing a thread"""
+        self._admit()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        try:
+            async with self._semaphore:
+                yield
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "active": min(self.pending, self.workers),
+            "queued": max(self.pending - self.workers, 0),
+            "queue_size": self.queue_size,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
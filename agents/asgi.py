@@ -0,0 +1,460 @@
+"""
+ASGI gateway. The chatbot and tutor agents run on the server's own event
+loop and their REST handlers are called in-process, so a gateway request
+no longer makes a localhost HTTP hop or crosses into an agent thread.
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+"""
+
+from __future__ import annotations
+from typing import Any, AsyncIterator, Dict
+import asyncio
+import json
+import os
+import sys
+from urllib.parse import parse_qsl
+
+from dotenv import load_dotenv
+from uagents.dispatch import dispatcher
+import uvicorn
+
+AGENTS_DIR = os.path.dirname(os.path.abspath(__file__))
+# Add the agents directory to path
+sys.path.append(os.path.join(AGENTS_DIR, "agents_flat"))
+
+# Before asi_client reads its settings from the environment
+load_dotenv()
+
+from agents_flat.agent_chatbot import (
+    BUSY_REPLY,
+    ChatRequest,
+    ChatTurnRequest,
+    _workers as chatbot_workers,
+    agent as chatbot_agent,
+)
+from agents_flat.agent_tutor import (
+    AdviseRequest,
+    KnowledgeMatchRequest,
+    tutor_agent,
+)
+from metta_store import format_dump_error
+from asi_client import async_chat_completion_stream, breaker as asi_breaker
+from prompts import build_move_messages
+from worker_pool import PoolBusyError
+from gateway_common import (
+    AGENTS_INFO,
+    DUMP_CONTENT_TYPES,
+    DUMP_PAGE_SIZE,
+    DUMP_SCOPE,
+    advise_deadline_ms,
+    async_stream_completion,
+    format_dump_page,
+    is_gateway_only,
+    sse as _sse,
+)
+
+AGENTS = {"chatbot": chatbot_agent, "tutor": tutor_agent}
+INDEX_HTML = os.path.join(AGENTS_DIR, "frontend", "templates", "index.html")
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-headers", b"Content-Type,Authorization"),
+    (b"access-control-allow-methods", b"GET,PUT,POST,DELETE,OPTIONS"),
+]
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return body
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def _read_json(receive) -> Dict[str, Any]:
+    try:
+        data = json.loads(await _read_body(receive))
+    except ValueError:
+        raise HttpError(400, "Request body is not valid JSON")
+    if not isinstance(data, dict):
+        raise HttpError(400, "Request body must be a JSON object")
+    return data
+
+
+async def _start(send, status: int, content_type: str, **headers) -> None:
+    extra = [
+        (k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()
+    ]
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", content_type.encode())] + extra,
+        }
+    )
+
+
+async def _send_json(send, data: Any, status: int = 200) -> None:
+    await _start(send, status, "application/json")
+    await send(
+        {"type": "http.response.body", "body": json.dumps(data).encode()}
+    )
+
+
+async def _send_stream(
+    send, chunks: AsyncIterator[str], content_type: str, **headers
+) -> None:
+    await _start(send, 200, content_type, **headers)
+    async for chunk in chunks:
+        await send(
+            {
+                "type": "http.response.body",
+                "body": chunk.encode(),
+                "more_body": True,
+            }
+        )
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _call_agent(agent, method: str, endpoint: str, message=None):
+    """REST handler response as a dict, without leaving the process"""
+    response = await dispatcher.dispatch_rest(
+        destination=agent.address,
+        method=method,
+        endpoint=endpoint,
+        message=message,
+    )
+    if response is None:
+        raise HttpError(503, f"Agent not ready: {agent.name}")
+    return response if isinstance(response, dict) else response.model_dump()
+
+
+def _build(model, payload: Dict[str, Any]):
+    try:
+        return model(**payload)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+
+
+async def index(scope, receive, send):
+    with open(INDEX_HTML, "rb") as f:
+        body = f.read()
+    await _start(send, 200, "text/html; charset=utf-8")
+    await send({"type": "http.response.body", "body": body})
+
+
+async def api_chat(scope, receive, send):
+    data = await _read_json(receive)
+    request = _build(
+        ChatRequest,
+        {
+            "user_id": data.get("user_id", "u1"),
+            "message": data.get("message", "Hello"),
+            "model": data.get("model", "asi1-fast"),
+        },
+    )
+    await _send_json(
+        send, await _call_agent(chatbot_agent, "POST", "/chat", request)
+    )
+
+
+async def api_advise(scope, receive, send):
+    data = await _read_json(receive)
+    request = _build(
+        AdviseRequest,
+        {
+            "user_id": data.get("user_id", "u1"),
+            "state": data.get("state", {}),
+            "question": data.get("question"),
+            "force_refresh": data.get("force_refresh", False),
+            "game_id": data.get("game_id"),
+            "deadline_ms": advise_deadline_ms(
+                dict(scope["headers"]).get(b"x-deadline-ms"), data
+            ),
+        },
+    )
+    await _send_json(
+        send, await _call_agent(tutor_agent, "POST", "/advise", request)
+    )
+
+
+async def _send_sse(send, events: AsyncIterator[str]) -> None:
+    """Server-sent events response that proxies must not buffer"""
+    await _send_stream(
+        send,
+        events,
+        "text/event-stream",
+        cache_control="no-cache",
+        x_accel_buffering="no",
+    )
+
+
+def _stream_completion(messages, model="asi1-fast", on_done=None):
+    return async_stream_completion(
+        async_chat_completion_stream(messages, model), on_done
+    )
+
+
+async def api_chat_stream(scope, receive, send):
+    """Stream the chatbot reply as SSE `{"delta": ...}` events. FAQ and
+    cached answers arrive as a single event; otherwise the prompt carries
+    the user's history and the finished reply is recorded as a turn, so
+    this matches /api/chat"""
+    data = await _read_json(receive)
+    request = _build(
+        ChatRequest,
+        {
+            "user_id": data.get("user_id", "u1"),
+            "message": data.get("message", "Hello"),
+            "model": data.get("model", "asi1-fast"),
+        },
+    )
+    prepared = await _call_agent(
+        chatbot_agent, "POST", "/chat/prepare", request
+    )
+
+    async def record(reply):
+        turn = ChatTurnRequest(turn_id=prepared["turn_id"], reply=reply)
+        await _call_agent(chatbot_agent, "POST", "/chat/turn", turn)
+
+    async def generate():
+        if prepared.get("reply") is not None:
+            yield _sse({"delta": prepared["reply"]})
+            yield _sse({"done": True})
+            return
+        try:
+            # Streams count against the chatbot's worker pool
+            async with chatbot_workers.slot():
+                async for event in _stream_completion(
+                    prepared["messages"], request.model, record
+                ):
+                    yield event
+        except PoolBusyError:
+            yield _sse({"error": BUSY_REPLY})
+
+    await _send_sse(send, generate())
+
+
+async def api_advise_stream(scope, receive, send):
+    """Stream tutor advice: MeTTa advice arrives as a single event, the
+    ASI:One fallback token by token"""
+    data = await _read_json(receive)
+    state = data.get("state", {})
+    question = data.get("question")
+    request = _build(
+        AdviseRequest,
+        {
+            "user_id": data.get("user_id", "u1"),
+            "state": state,
+            "question": question,
+            "force_refresh": data.get("force_refresh", False),
+            "game_id": data.get("game_id"),
+            "local_only": True,
+        },
+    )
+    local = await _call_agent(tutor_agent, "POST", "/advise", request)
+
+    async def generate():
+        if local.get("source") != "none":
+            yield _sse({"delta": local["advice"], "source": local["source"]})
+            yield _sse({"done": True})
+            return
+        async for event in _stream_completion(
+            build_move_messages(state, question)
+        ):
+            yield event
+
+    await _send_sse(send, generate())
+
+
+async def health_check(scope, receive, send):
+    agents = _runner.status()
+    ready = all(agent["ready"] for agent in agents.values())
+    await _send_json(
+        send,
+        {
+            "status": "healthy" if ready else "degraded",
+            "services": ["frontend", "chatbot", "tutor"],
+            "agents": agents,
+            "asi_circuit": asi_breaker.stats(),
+        },
+    )
+
+
+async def _dump_page(cursor):
+    page = await _call_agent(
+        tutor_agent,
+        "POST",
+        "/knowledge/match",
+        KnowledgeMatchRequest(cursor=cursor, limit=DUMP_PAGE_SIZE),
+    )
+    if page.get("error"):
+        raise HttpError(502, f"Knowledge dump failed: {page['error']}")
+    return page
+
+
+async def knowledge_dump(scope, receive, send):
+    """Stream the tutor's (relation subject value) facts as NDJSON or MeTTa
+    text, one page at a time. Rules, queries and other atoms are not
+    exported; the X-Dump-Scope header says so"""
+    query = dict(parse_qsl(scope["query_string"].decode()))
+    fmt = query.get("format", "ndjson")
+    if fmt not in DUMP_CONTENT_TYPES:
+        raise HttpError(400, f"Unsupported format: {fmt}")
+    # Fetched before the response starts, so an early failure still gets
+    # an error status
+    first = await _dump_page(None)
+
+    async def generate():
+        page = first
+        while True:
+            for line in format_dump_page(page, fmt):
+                yield line
+            cursor = page.get("next_cursor")
+            if not cursor:
+                return
+            try:
+                page = await _dump_page(cursor)
+            except Exception as e:
+                # The status is already sent, so end with an error line
+                # rather than a silently truncated dump
+                yield format_dump_error(str(e), fmt)
+                return
+
+    await _send_stream(
+        send, generate(), DUMP_CONTENT_TYPES[fmt], x_dump_scope=DUMP_SCOPE
+    )
+
+
+async def agents_info(scope, receive, send):
+    await _send_json(send, AGENTS_INFO)
+
+
+ROUTES = {
+    ("GET", "/"): index,
+    ("POST", "/api/chat"): api_chat,
+    ("POST", "/api/advise"): api_advise,
+    ("POST", "/api/chat/stream"): api_chat_stream,
+    ("POST", "/api/advise/stream"): api_advise_stream,
+    ("GET", "/health"): health_check,
+    ("GET", "/agents/tutor/knowledge/dump"): knowledge_dump,
+    ("GET", "/agents/info"): agents_info,
+}
+
+
+async def proxy_agent(agent, path: str, scope, receive, send):
+    """Hand the request to the agent's own ASGI server, as if it had
+    arrived on the agent's port"""
+    await agent._server(dict(scope, path=path, raw_path=None), receive, send)
+
+
+class AgentRunner:
+    """Runs the agents' background tasks (startup and interval handlers,
+    message dispenser, mailbox) on the serving loop"""
+
+    def __init__(self, agents) -> None:
+        self._agents = agents
+        self._tasks: Dict[str, list] = {}
+        self._ready: Dict[str, bool] = {key: False for key in agents}
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        for key, agent in self._agents.items():
+            agent.update_loop(loop)
+            agent.setup()
+            tasks = []
+            if agent.mailbox_client is not None:
+                tasks.append(loop.create_task(agent.mailbox_client.run()))
+            self._tasks[key] = tasks
+            self._ready[key] = True
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            key: {
+                "ready": self._ready[key],
+                "mailbox": any(
+                    not task.done() for task in self._tasks.get(key, [])
+                ),
+            }
+            for key in self._agents
+        }
+
+    async def stop(self) -> None:
+        for key in self._agents:
+            self._ready[key] = False
+        await asyncio.gather(
+            *(
+                agent._shutdown(self._tasks.pop(key, []))
+                for key, agent in self._agents.items()
+            ),
+            return_exceptions=True,
+        )
+
+
+_runner = AgentRunner(AGENTS)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                _runner.start()
+            except Exception as e:
+                await send(
+                    {"type": "lifespan.startup.failed", "message": str(e)}
+                )
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await _runner.stop()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    async def send_with_cors(message):
+        if message["type"] == "http.response.start":
+            message = dict(
+                message, headers=list(message["headers"]) + CORS_HEADERS
+            )
+        await send(message)
+
+    method, path = scope["method"], scope["path"]
+    if method == "OPTIONS":
+        await _start(send_with_cors, 204, "text/plain")
+        await send_with_cors({"type": "http.response.body", "body": b""})
+        return
+    try:
+        handler = ROUTES.get((method, path))
+        if handler is not None:
+            await handler(scope, receive, send_with_cors)
+            return
+        if path.startswith("/agents/"):
+            name, _, rest = path[len("/agents/") :].partition("/")
+            if name in AGENTS and rest and not is_gateway_only(name, rest):
+                await proxy_agent(
+                    AGENTS[name], "/" + rest, scope, receive, send_with_cors
+                )
+                return
+        raise HttpError(404, "Not found")
+    except HttpError as e:
+        await _send_json(send_with_cors, {"error": str(e)}, e.status)
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
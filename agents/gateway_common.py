@@ -0,0 +1,128 @@
+"""
+Pieces shared by the two gateways, start.py (Flask, agents in their own
+processes) and asgi.py (agents on the serving loop): SSE framing, the
+ASI:One stream relay, the knowledge dump format and the /agents/info
+table.
+"""
+
+from __future__ import annotations
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    Mapping,
+    Optional,
+)
+import json
+
+from metta_store import format_fact
+
+# Chatbot endpoints only the gateway may call; /chat/turn writes the
+# shared answer cache, so they are not proxied
+GATEWAY_ONLY_PATHS = {("chatbot", "chat/prepare"), ("chatbot", "chat/turn")}
+
+DUMP_CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "metta": "text/plain",
+}
+DUMP_PAGE_SIZE = 1000
+# The dump covers the triple index only, not every atom of the MeTTa space
+DUMP_SCOPE = "triples"
+
+AGENTS_INFO = {
+    "chatbot": {
+        "name": "multipoly-chatbot",
+        "port": 8010,
+        "endpoints": ["/chat", "/health"],
+        "direct_access": "https://multipoly.onrender.com/agents/chatbot",
+    },
+    "tutor": {
+        "name": "multipoly-tutor",
+        "port": 8011,
+        "endpoints": [
+            "/advise",
+            "/games/end",
+            "/knowledge/update",
+            "/knowledge/query/{relation}/{subject}",
+            "/knowledge/bulk",
+            "/knowledge/reload",
+            "/knowledge/match",
+            "/knowledge/dump",
+            "/stats/prompts",
+            "/health",
+        ],
+        "direct_access": "https://multipoly.onrender.com/agents/tutor",
+    },
+}
+
+
+def is_gateway_only(agent: str, path: str) -> bool:
+    return (agent, path.strip("/")) in GATEWAY_ONLY_PATHS
+
+
+def advise_deadline_ms(
+    header: Optional[Any], data: Mapping[str, Any]
+) -> Optional[int]:
+    """ASI:One budget from the X-Deadline-Ms header or `deadline_ms` field;
+    None leaves the tutor's default"""
+    deadline = data.get("deadline_ms") if header is None else header
+    try:
+        return None if deadline is None else int(deadline)
+    except (TypeError, ValueError):
+        return None
+
+
+def sse(data: Any) -> str:
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# uAgents REST handlers answer with one JSON body, so token streaming from
+# ASI:One happens in the gateway. The finished reply goes to `on_done`
+def stream_completion(
+    deltas: Iterator[str], on_done: Optional[Callable[[str], Any]] = None
+) -> Iterator[str]:
+    parts = []
+    try:
+        for delta in deltas:
+            parts.append(delta)
+            yield sse({"delta": delta})
+    except Exception as e:
+        yield sse({"error": f"ASI:One error: {e}"})
+        return
+    if on_done is not None:
+        on_done("".join(parts))
+    yield sse({"done": True})
+
+
+async def async_stream_completion(
+    deltas: AsyncIterator[str],
+    on_done: Optional[Callable[[str], Awaitable[Any]]] = None,
+) -> AsyncIterator[str]:
+    parts = []
+    try:
+        async for delta in deltas:
+            parts.append(delta)
+            yield sse({"delta": delta})
+    except Exception as e:
+        yield sse({"error": f"ASI:One error: {e}"})
+        return
+    if on_done is not None:
+        await on_done("".join(parts))
+    yield sse({"done": True})
+
+
+def format_dump_page(page: Dict[str, Any], fmt: str) -> Iterator[str]:
+    """Lines for one /knowledge/match page of the knowledge dump"""
+    for fact in page["results"]:
+        yield format_fact(
+            (
+                fact["relation"],
+                fact["subject"],
+                fact["value"],
+                fact["grounded"],
+            ),
+            fmt,
+        )
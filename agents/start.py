@@ -1,59 +1,64 @@
-from flask import Flask, request, jsonify, render_template
+from flask import (
+    Flask,
+    Response,
+    jsonify,
+    render_template,
+    request,
+    stream_with_context,
+)
 from flask_cors import CORS
+from dotenv import load_dotenv
 import requests
-import threading
-import time
+from requests.adapters import HTTPAdapter
+import atexit
 import sys
+import threading
 import os
-import asyncio
-
-# Add the agents directory to path
-sys.path.append("agents_flat")
 
+AGENTS_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Import and run agents in threads
-def run_agents():
-    """Start both agents in separate threads"""
-
-    def start_chatbot():
-        # Create new event loop for this thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            # Import and initialize the chatbot agent
-            from agents_flat.agent_chatbot import agent as chatbot_agent
-
-            # Run the agent
-            chatbot_agent.run()
-        except Exception as e:
-            print(f"Error in chatbot thread: {e}")
-        finally:
-            loop.close()
-
-    def start_tutor():
-        # Create new event loop for this thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            # Import and initialize the tutor agent
-            from agents_flat.agent_tutor import tutor_agent
-
-            # Run the agent
-            tutor_agent.run()
-        except Exception as e:
-            print(f"Error in tutor thread: {e}")
-        finally:
-            loop.close()
-
-    # Start agents in daemon threads
-    chatbot_thread = threading.Thread(target=start_chatbot, daemon=True)
-    tutor_thread = threading.Thread(target=start_tutor, daemon=True)
-
-    chatbot_thread.start()
-    time.sleep(2)
-    tutor_thread.start()
+# Add the agents directory to path
+sys.path.append(os.path.join(AGENTS_DIR, "agents_flat"))
+
+# Before asi_client reads its settings from the environment
+load_dotenv()
+
+from metta_store import format_dump_error
+from asi_client import breaker as asi_breaker, chat_completion_stream
+from prompts import build_move_messages
+from supervisor import AgentProcess, Supervisor
+from gateway_common import (
+    AGENTS_INFO,
+    DUMP_CONTENT_TYPES,
+    DUMP_PAGE_SIZE,
+    DUMP_SCOPE,
+    advise_deadline_ms,
+    format_dump_page,
+    is_gateway_only,
+    sse as _sse,
+    stream_completion,
+)
 
-    return chatbot_thread, tutor_thread
+# Each agent runs in its own process and is restarted if it crashes
+supervisor = Supervisor(
+    [
+        AgentProcess(
+            "chatbot",
+            os.path.join(AGENTS_DIR, "agents_flat", "agent_chatbot.py"),
+            "http://127.0.0.1:8010/health",
+            cwd=AGENTS_DIR,
+        ),
+        AgentProcess(
+            "tutor",
+            os.path.join(AGENTS_DIR, "agents_flat", "agent_tutor.py"),
+            "http://127.0.0.1:8011/health",
+            cwd=AGENTS_DIR,
+        ),
+    ]
+)
+# Upper bound on the cold start wait; the gateway serves (and reports the
+# agents as not ready) once it passes
+AGENT_READY_TIMEOUT = float(os.environ.get("AGENT_READY_TIMEOUT", "120"))
 
 
 app = Flask(
@@ -81,12 +86,136 @@ def after_request(response):
 
 # Start agents
 print("🚀 Starting agents...")
-run_agents()
-time.sleep(5)  # Give agents time to start
+supervisor.start()
+atexit.register(supervisor.stop)
+if not supervisor.wait_ready(AGENT_READY_TIMEOUT):
+    print(f"⚠️ Agents not ready after {AGENT_READY_TIMEOUT:.0f}s")
 
 # Frontend routes (copied from frontend/app.py)
 CHAT_URL = os.environ.get("CHAT_URL", "http://127.0.0.1:8010/chat")
 TUTOR_URL = os.environ.get("TUTOR_URL", "http://127.0.0.1:8011/advise")
+CHATBOT_UPSTREAM = "http://127.0.0.1:8010"
+TUTOR_UPSTREAM = "http://127.0.0.1:8011"
+UPSTREAM_TIMEOUT = (
+    float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", "2")),
+    float(os.environ.get("UPSTREAM_READ_TIMEOUT", "60")),
+)
+# Headers that describe one connection and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+}
+
+# Keep-alive connections to the agents; urllib3 keeps a separate pool for
+# each upstream host:port
+_upstream = requests.Session()
+_upstream.mount(
+    "http://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=int(os.environ.get("UPSTREAM_POOL_SIZE", "32")),
+    ),
+)
+
+
+# Chat replies streamed from the gateway are admitted here, as the
+# chatbot's worker pool cannot hold a slot across its REST calls
+_chat_streams = threading.BoundedSemaphore(
+    int(os.environ.get("CHAT_STREAM_WORKERS", "8"))
+)
+CHAT_STREAM_BUSY = (
+    "I'm answering a lot of players right now, please try again in a moment."
+)
+
+
+class UpstreamError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+@app.errorhandler(UpstreamError)
+def upstream_error(e):
+    return {"error": str(e)}, e.status
+
+
+def _forward_headers(headers, drop=()):
+    """End-to-end headers only, minus any listed in Connection"""
+    listed = {
+        h.strip().lower() for h in headers.get("Connection", "").split(",")
+    }
+    skip = HOP_BY_HOP_HEADERS | listed | set(drop)
+    return [(k, v) for k, v in headers.items() if k.lower() not in skip]
+
+
+def _upstream_request(method, url, **kwargs):
+    """Request to an agent on the pooled session; connection failures
+    become 502 and timeouts 504"""
+    try:
+        return _upstream.request(
+            method, url, timeout=UPSTREAM_TIMEOUT, **kwargs
+        )
+    except requests.Timeout:
+        raise UpstreamError(504, f"Upstream timed out: {url}")
+    except requests.RequestException as e:
+        raise UpstreamError(502, f"Upstream unavailable: {e}")
+
+
+def _upstream_json(url, payload):
+    r = _upstream_request("POST", url, json=payload)
+    if r.status_code >= 400:
+        raise UpstreamError(502, f"Upstream returned {r.status_code}: {url}")
+    return r.json()
+
+
+class _RequestBody:
+    """Incoming body streamed upstream with its known length, so it is
+    not re-sent chunked"""
+
+    def __init__(self, stream, length):
+        self._stream = stream
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        return self._stream.read(size)
+
+
+def _proxy(upstream, path):
+    """Stream the request to `upstream` and the response back"""
+    if request.content_length:
+        body = _RequestBody(request.stream, request.content_length)
+    elif "chunked" in request.headers.get("Transfer-Encoding", "").lower():
+        body = iter(lambda: request.stream.read(8192), b"")
+    else:
+        body = None
+    resp = _upstream_request(
+        request.method,
+        f"{upstream}/{path}",
+        params=request.args,
+        data=body,
+        headers=dict(
+            _forward_headers(request.headers, ("host", "content-length"))
+        ),
+        stream=True,
+    )
+    response = Response(
+        # Undecoded, so the Content-Encoding/Length headers stay valid
+        stream_with_context(resp.raw.stream(8192, decode_content=False)),
+        status=resp.status_code,
+        headers=_forward_headers(resp.headers),
+    )
+    response.call_on_close(resp.close)
+    return response
 
 
 @app.route("/")
@@ -100,12 +229,12 @@ def api_chat():
     user_id = data.get("user_id", "u1")
     message = data.get("message", "Hello")
     model = data.get("model", "asi1-fast")
-    r = requests.post(
-        CHAT_URL,
-        json={"user_id": user_id, "message": message, "model": model},
+    return jsonify(
+        _upstream_json(
+            CHAT_URL,
+            {"user_id": user_id, "message": message, "model": model},
+        )
     )
-    r.raise_for_status()
-    return jsonify(r.json())
 
 
 @app.route("/api/advise", methods=["POST"])
@@ -116,17 +245,108 @@ def api_advise():
         "state": data.get("state", {}),
         "question": data.get("question"),
         "force_refresh": data.get("force_refresh", False),
+        "game_id": data.get("game_id"),
+        "deadline_ms": advise_deadline_ms(
+            request.headers.get("X-Deadline-Ms"), data
+        ),
     }
-    r = requests.post(TUTOR_URL, json=payload)
-    r.raise_for_status()
-    return jsonify(r.json())
+    return jsonify(_upstream_json(TUTOR_URL, payload))
+
+
+def _sse_response(events) -> Response:
+    """Server-sent events response that proxies must not buffer"""
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _stream_completion(messages, model="asi1-fast", on_done=None):
+    return stream_completion(
+        chat_completion_stream(messages, model=model), on_done
+    )
+
+
+@app.route("/api/chat/stream", methods=["POST"])
+def api_chat_stream():
+    """Stream the chatbot reply as SSE `{"delta": ...}` events. The chatbot
+    answers FAQ and cached questions (sent as a single event) and supplies
+    the prompt with the user's history; the finished reply is recorded
+    back as a turn, so this matches /api/chat"""
+    data = request.get_json(force=True)
+    payload = {
+        "user_id": data.get("user_id", "u1"),
+        "message": data.get("message", "Hello"),
+        "model": data.get("model", "asi1-fast"),
+    }
+    prepared = _upstream_json(f"{CHATBOT_UPSTREAM}/chat/prepare", payload)
+    if prepared.get("reply") is not None:
+        events = iter(
+            [_sse({"delta": prepared["reply"]}), _sse({"done": True})]
+        )
+        return _sse_response(events)
+
+    def record(reply):
+        try:
+            _upstream_json(
+                f"{CHATBOT_UPSTREAM}/chat/turn",
+                {"turn_id": prepared["turn_id"], "reply": reply},
+            )
+        except UpstreamError as e:
+            print(f"Could not record streamed chat turn: {e}")
+
+    def generate():
+        if not _chat_streams.acquire(blocking=False):
+            yield _sse({"error": CHAT_STREAM_BUSY})
+            return
+        try:
+            yield from _stream_completion(
+                prepared["messages"], payload["model"], record
+            )
+        finally:
+            _chat_streams.release()
+
+    return _sse_response(generate())
+
+
+@app.route("/api/advise/stream", methods=["POST"])
+def api_advise_stream():
+    """Stream tutor advice: MeTTa advice arrives as a single event, the
+    ASI:One fallback token by token"""
+    data = request.get_json(force=True)
+    state = data.get("state", {})
+    question = data.get("question")
+    payload = {
+        "user_id": data.get("user_id", "u1"),
+        "state": state,
+        "question": question,
+        "force_refresh": data.get("force_refresh", False),
+        "game_id": data.get("game_id"),
+        "local_only": True,
+    }
+    local = _upstream_json(TUTOR_URL, payload)
+
+    def generate():
+        if local.get("source") != "none":
+            yield _sse({"delta": local["advice"], "source": local["source"]})
+            yield _sse({"done": True})
+            return
+        yield from _stream_completion(build_move_messages(state, question))
+
+    return _sse_response(generate())
 
 
 @app.route("/health")
 def health_check():
+    agents = supervisor.status()
+    ready = all(agent["ready"] for agent in agents.values())
     return {
-        "status": "healthy",
+        "status": "healthy" if ready else "degraded",
         "services": ["frontend", "chatbot", "tutor"],
+        "agents": agents,
+        # The gateway's own breaker, used by the /stream routes
+        "asi_circuit": asi_breaker.stats(),
     }, 200
 
 
@@ -136,20 +356,9 @@ def health_check():
 )
 def proxy_chatbot(path):
     """Proxy requests to chatbot agent"""
-    import requests
-
-    url = f"http://127.0.0.1:8010/{path}"
-
-    if request.method == "GET":
-        resp = requests.get(url, params=request.args)
-    elif request.method == "POST":
-        resp = requests.post(url, json=request.get_json(), params=request.args)
-    elif request.method == "PUT":
-        resp = requests.put(url, json=request.get_json(), params=request.args)
-    elif request.method == "DELETE":
-        resp = requests.delete(url, params=request.args)
-
-    return resp.content, resp.status_code, resp.headers.items()
+    if is_gateway_only("chatbot", path):
+        return {"error": "Not found"}, 404
+    return _proxy(CHATBOT_UPSTREAM, path)
 
 
 @app.route(
@@ -157,44 +366,57 @@ def proxy_chatbot(path):
 )
 def proxy_tutor(path):
     """Proxy requests to tutor agent"""
-    import requests
-
-    url = f"http://127.0.0.1:8011/{path}"
+    return _proxy(TUTOR_UPSTREAM, path)
 
-    if request.method == "GET":
-        resp = requests.get(url, params=request.args)
-    elif request.method == "POST":
-        resp = requests.post(url, json=request.get_json(), params=request.args)
-    elif request.method == "PUT":
-        resp = requests.put(url, json=request.get_json(), params=request.args)
-    elif request.method == "DELETE":
-        resp = requests.delete(url, params=request.args)
 
-    return resp.content, resp.status_code, resp.headers.items()
+def _dump_page(cursor):
+    page = _upstream_json(
+        f"{TUTOR_UPSTREAM}/knowledge/match",
+        {"cursor": cursor, "limit": DUMP_PAGE_SIZE},
+    )
+    if page.get("error"):
+        raise UpstreamError(502, f"Knowledge dump failed: {page['error']}")
+    return page
+
+
+@app.route("/agents/tutor/knowledge/dump")
+def knowledge_dump():
+    """Stream the tutor's (relation subject value) facts as NDJSON or MeTTa
+    text, one page at a time. Rules, queries and other atoms are not
+    exported; the X-Dump-Scope header says so"""
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in DUMP_CONTENT_TYPES:
+        return {"error": f"Unsupported format: {fmt}"}, 400
+    # Fetched before the response starts, so an early failure still gets
+    # an error status
+    first = _dump_page(None)
+
+    def generate():
+        page = first
+        while True:
+            yield from format_dump_page(page, fmt)
+            cursor = page.get("next_cursor")
+            if not cursor:
+                return
+            try:
+                page = _dump_page(cursor)
+            except (UpstreamError, ValueError) as e:
+                # The status is already sent, so end with an error line
+                # rather than a silently truncated dump
+                yield format_dump_error(str(e), fmt)
+                return
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=DUMP_CONTENT_TYPES[fmt],
+        headers={"X-Dump-Scope": DUMP_SCOPE},
+    )
 
 
 # Agent info endpoints
 @app.route("/agents/info")
 def agents_info():
-    return {
-        "chatbot": {
-            "name": "multipoly-chatbot",
-            "port": 8010,
-            "endpoints": ["/chat", "/health"],
-            "direct_access": "https://multipoly.onrender.com/agents/chatbot",
-        },
-        "tutor": {
-            "name": "multipoly-tutor",
-            "port": 8011,
-            "endpoints": [
-                "/advise",
-                "/update_knowledge",
-                "/query_knowledge",
-                "/health",
-            ],
-            "direct_access": "https://multipoly.onrender.com/agents/tutor",
-        },
-    }, 200
+    return AGENTS_INFO, 200
 
 
 if __name__ == "__main__":
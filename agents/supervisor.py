@@ -0,0 +1,192 @@
+"""
+Agent supervisor for the gateway. Each agent runs in its own process, so
+the agents don't share a GIL and a crash in one leaves the others up.
+Each agent's /health endpoint is polled until it is ready and then at an
+interval; crashed agents, agents that hang during startup and agents that
+stop answering are restarted with exponential backoff.
+"""
+
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+# Restart delays double from BACKOFF_BASE up to BACKOFF_MAX seconds; an
+# agent that stayed up for STABLE_AFTER seconds starts over at the base
+BACKOFF_BASE = float(os.environ.get("AGENT_RESTART_BACKOFF", "1"))
+BACKOFF_MAX = float(os.environ.get("AGENT_RESTART_BACKOFF_MAX", "60"))
+STABLE_AFTER = 60.0
+PROBE_INTERVAL = 0.25
+PROBE_TIMEOUT = 2.0
+# Once ready, /health is checked every LIVENESS_INTERVAL seconds and a
+# hung agent is restarted after MAX_PROBE_FAILURES misses in a row
+LIVENESS_INTERVAL = float(os.environ.get("AGENT_LIVENESS_INTERVAL", "5"))
+MAX_PROBE_FAILURES = int(os.environ.get("AGENT_MAX_PROBE_FAILURES", "3"))
+# An agent that has not answered /health this many seconds after being
+# spawned is taken as hung during startup and restarted
+STARTUP_TIMEOUT = float(os.environ.get("AGENT_STARTUP_TIMEOUT", "120"))
+
+
+class AgentProcess:
+    """One supervised agent: its process, readiness and restart history"""
+
+    def __init__(
+        self,
+        name: str,
+        script: str,
+        health_url: str,
+        cwd: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.script = script
+        self.health_url = health_url
+        self.cwd = cwd
+        self.process: Optional[subprocess.Popen] = None
+        self.ready = threading.Event()
+        self.restarts = 0
+        self.last_exit: Optional[int] = None
+        self.started_at: Optional[float] = None
+        self.ready_after: Optional[float] = None
+
+    def spawn(self) -> None:
+        self.ready.clear()
+        self.started_at = time.monotonic()
+        self.ready_after = None
+        self.process = subprocess.Popen(
+            [sys.executable, self.script], cwd=self.cwd
+        )
+
+    def terminate(self, timeout: float = 10.0) -> None:
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+    def probe(self) -> bool:
+        try:
+            return requests.get(self.health_url, timeout=PROBE_TIMEOUT).ok
+        except requests.RequestException:
+            return False
+
+    def status(self) -> Dict[str, Any]:
+        alive = self.process is not None and self.process.poll() is None
+        return {
+            "ready": self.ready.is_set(),
+            "alive": alive,
+            "pid": self.process.pid if alive else None,
+            "restarts": self.restarts,
+            "last_exit": self.last_exit,
+            "ready_after": self.ready_after,
+        }
+
+
+class Supervisor:
+    """Starts the agents, waits for them to become ready and keeps them
+    running; each agent is watched by its own thread"""
+
+    def __init__(self, agents: List[AgentProcess]) -> None:
+        self.agents = {agent.name: agent for agent in agents}
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for agent in self.agents.values():
+            thread = threading.Thread(
+                target=self._watch,
+                args=(agent,),
+                name=f"supervise-{agent.name}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until every agent answers /health, or `timeout` passes"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for agent in self.agents.values():
+            remaining = (
+                None if deadline is None else deadline - time.monotonic()
+            )
+            if remaining is not None and remaining <= 0:
+                return False
+            if not agent.ready.wait(remaining):
+                return False
+        return True
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {name: agent.status() for name, agent in self.agents.items()}
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stopping.set()
+        for agent in self.agents.values():
+            if agent.process is not None and agent.process.poll() is None:
+                agent.process.terminate()
+        for agent in self.agents.values():
+            if agent.process is None:
+                continue
+            try:
+                agent.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                agent.process.kill()
+
+    def _probe_until_exit(self, agent: AgentProcess) -> None:
+        """Probe /health while the process runs; an agent that is not ready
+        within STARTUP_TIMEOUT, or a ready agent that misses
+        MAX_PROBE_FAILURES probes in a row, is terminated"""
+        failures = 0
+        while agent.process.poll() is None:
+            if agent.probe():
+                failures = 0
+                if agent.ready_after is None:
+                    agent.ready_after = round(
+                        time.monotonic() - agent.started_at, 2
+                    )
+                    print(f"✅ {agent.name} ready in {agent.ready_after}s")
+                agent.ready.set()
+            elif agent.ready_after is not None:
+                # Failures only count once the agent has been ready
+                failures += 1
+                agent.ready.clear()
+                if failures >= MAX_PROBE_FAILURES:
+                    print(f"⚠️ {agent.name} stopped answering /health")
+                    agent.terminate()
+                    return
+            elif time.monotonic() - agent.started_at >= STARTUP_TIMEOUT:
+                print(f"⚠️ {agent.name} not ready after {STARTUP_TIMEOUT:g}s")
+                agent.terminate()
+                return
+            if agent.ready_after is None:
+                interval = PROBE_INTERVAL
+            else:
+                interval = LIVENESS_INTERVAL
+            if self._stopping.wait(interval):
+                return
+
+    def _watch(self, agent: AgentProcess) -> None:
+        backoff = BACKOFF_BASE
+        while not self._stopping.is_set():
+            agent.spawn()
+            self._probe_until_exit(agent)
+            if self._stopping.is_set():
+                agent.ready.clear()
+                return
+            agent.last_exit = agent.process.wait()
+            agent.ready.clear()
+            if time.monotonic() - agent.started_at >= STABLE_AFTER:
+                backoff = BACKOFF_BASE
+            print(
+                f"⚠️ {agent.name} exited with {agent.last_exit}, "
+                f"restarting in {backoff:g}s"
+            )
+            if self._stopping.wait(backoff):
+                return
+            backoff = min(backoff * 2, BACKOFF_MAX)
+            agent.restarts += 1